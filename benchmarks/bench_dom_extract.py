@@ -0,0 +1,102 @@
+"""WebDriver commands and wall time per job, per-element extraction vs batched execute_script.
+
+Writes a local listing page whose rows open detail pages in a new tab, then
+scrapes it with scrape_job_page (one WebDriver call per field) and with
+extract_listing_rows + scrape_job_row (one execute_script per page and per
+tab), counting every command sent to chromedriver. Requires Chrome.
+
+Usage:
+    python3 benchmarks/bench_dom_extract.py [rows]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium import webdriver  # noqa: E402
+from selenium.webdriver.common.by import By  # noqa: E402
+
+import main  # noqa: E402
+from dom_extract import extract_listing_rows  # noqa: E402
+
+META_TAGS = ("description", "keywords", "author", "robots", "viewport", "og:title")
+
+
+def write_fixture(directory, rows):
+    """Write a listing page with `rows` jobs and one detail page per job"""
+    listing = ["<html><body><table>"]
+    for i in range(rows):
+        listing.append(
+            f"<tr id='tr{i}' onclick=\"window.open('detail{i}.html', '_blank')\">"
+            f"<td width='5%' align='center'>{i:010d}</td>"
+            f"<td width='28%'><h2>Engineer {i}</h2><h1>Employer {i}</h1><span>DEFZZZ</span></td>"
+            "<td nowrap>-</td><td nowrap>Mon Oct 13 2025</td><td nowrap>Sun Oct 26 2025</td></tr>"
+        )
+        meta = "".join(f"<meta name='{name}' content='{name} {i}'>" for name in META_TAGS)
+        with open(os.path.join(directory, f"detail{i}.html"), "w") as file:
+            file.write(f"<html><head><title>Engineer {i}</title>{meta}</head>"
+                       f"<body><div id='remark'>Text only advert {i}</div></body></html>")
+    listing.append("</table></body></html>")
+    path = os.path.join(directory, "listing.html")
+    with open(path, "w") as file:
+        file.write("".join(listing))
+    return f"file://{path}"
+
+
+def count_commands(driver):
+    """Wrap driver.execute so every WebDriver command is counted"""
+    counter = {"commands": 0}
+    execute = driver.execute
+
+    def counting_execute(*args, **kwargs):
+        counter["commands"] += 1
+        return execute(*args, **kwargs)
+
+    driver.execute = counting_execute
+    return counter
+
+
+def scrape_per_element(driver):
+    return [main.scrape_job_page(driver, element)
+            for element in driver.find_elements(By.CSS_SELECTOR, "tr[id^='tr']")]
+
+
+def scrape_batched(driver):
+    main_handle = driver.current_window_handle
+    return [main.scrape_job_row(driver, row, main_handle) for row in extract_listing_rows(driver)]
+
+
+def run(driver, url, scrape):
+    driver.get(url)
+    counter = count_commands(driver)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        jobs = scrape(driver)
+    elapsed = time.perf_counter() - start
+    del driver.execute
+    return jobs, counter["commands"], elapsed
+
+
+def main_benchmark():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as directory:
+        url = write_fixture(directory, rows)
+        driver = webdriver.Chrome(options=main.chrome_options)
+        try:
+            results = {}
+            for label, scrape in (("per-element", scrape_per_element), ("batched", scrape_batched)):
+                jobs, commands, elapsed = run(driver, url, scrape)
+                results[label] = jobs
+                print(f"{label:<12} {commands / rows:>7.1f} commands/job  {elapsed / rows * 1000:>8.1f} ms/job")
+            same = results["per-element"] == results["batched"]
+            print(f"identical records: {same}")
+        finally:
+            driver.quit()
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,64 @@
+"""OCR throughput of OcrStage as the worker count grows.
+
+Renders synthetic ad images with Pillow and pushes them through the process
+pool with 1, 2, 4, ... workers up to the number of CPUs, reporting images/sec
+and speedup over a single worker. Requires Tesseract.
+
+Usage:
+    python3 benchmarks/bench_ocr.py [images]
+"""
+import os
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from ocr_worker import OcrStage  # noqa: E402
+
+
+def make_ad(i):
+    """Render a PNG job advert with a few lines of text"""
+    image = Image.new("RGB", (800, 600), "white")
+    draw = ImageDraw.Draw(image)
+    lines = [
+        f"VACANCY {i}",
+        "Senior Software Engineer",
+        "Example (Pvt) Ltd is looking for an experienced engineer",
+        "Send your CV before the closing date",
+    ]
+    for row, line in enumerate(lines):
+        draw.text((40, 60 + row * 60), line, fill="black")
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def worker_counts():
+    count, cpus = 1, os.cpu_count() or 1
+    while count < cpus:
+        yield count
+        count *= 2
+    yield cpus
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    images = [make_ad(i) for i in range(total)]
+
+    baseline = None
+    for workers in worker_counts():
+        with OcrStage(workers) as stage:
+            stage.submit(images[0]).result()  # warm up the pool
+            start = time.perf_counter()
+            for future in [stage.submit(content) for content in images]:
+                future.result()
+            rate = total / (time.perf_counter() - start)
+        baseline = baseline or rate
+        print(f"{workers:>3} workers  {rate:>8.2f} images/sec  {rate / baseline:>5.2f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""OCR accuracy and time per image for each preprocessing / preset / batching option.
+
+Renders a fixture set of job ads with known text (large white pages with
+margins, tinted and dark backgrounds, high-DPI scans) and runs each OCR
+configuration over it on one core. For every configuration it reports
+ms/image, similarity to the current output (no preprocessing, default
+preset, one Tesseract process per image) and similarity to the text that
+was rendered. A directory of real ads can be used instead with --images,
+in which case only the comparison with the current output is available.
+Requires Tesseract.
+
+Usage:
+    python3 benchmarks/bench_ocr_engine.py [--ads 24] [--batch 8]
+    python3 benchmarks/bench_ocr_engine.py --images saved_ads/
+"""
+import argparse
+import difflib
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+import ocr_worker  # noqa: E402
+
+POSITIONS = ["Senior Software Engineer", "Accountant", "Sales Executive", "Quality Assurance Lead",
+             "Human Resources Manager", "Graphic Designer"]
+EMPLOYERS = ["Example (Pvt) Ltd", "Lanka Holdings PLC", "Colombo Traders", "Island Logistics"]
+BACKGROUNDS = [("white", "black"), ((235, 240, 250), (20, 30, 90)), ((25, 35, 70), "white")]
+
+# (label, preprocess, preset, batched)
+CONFIGURATIONS = [
+    ("current", False, "default", False),
+    ("preprocess", True, "default", False),
+    ("preprocess+block", True, "block", False),
+    ("preprocess+column", True, "column", False),
+    ("preprocess+sparse", True, "sparse", False),
+    ("preprocess+block batched", True, "block", True),
+]
+
+
+def make_ad(index, rng):
+    """Render an ad and return (PNG bytes, the text drawn on it)"""
+    background, ink = BACKGROUNDS[index % len(BACKGROUNDS)]
+    dpi = rng.choice([72, 96, 300, 600])
+    scale = max(1, dpi // 150)
+    image = Image.new("RGB", (1200 * scale, 1600 * scale), background)
+    draw = ImageDraw.Draw(image)
+    lines = [
+        "VACANCY",
+        rng.choice(POSITIONS),
+        rng.choice(EMPLOYERS),
+        f"Reference {index:06d}",
+        "Send your CV before the closing date",
+    ]
+    margin = rng.randint(80, 300) * scale
+    font = ImageFont.load_default(size=36 * scale)
+    for row, line in enumerate(lines):
+        draw.text((margin, margin + row * 70 * scale), line, fill=ink, font=font)
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", dpi=(dpi, dpi))
+    return buffer.getvalue(), " ".join(lines)
+
+
+def load_images(directory):
+    images = []
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "rb") as file:
+            images.append((file.read(), None))
+    return images
+
+
+def similarity(a, b):
+    return difflib.SequenceMatcher(None, " ".join(a.split()).lower(), " ".join(b.split()).lower()).ratio()
+
+
+def run(images, preprocess, preset, batched, batch_size):
+    ocr_worker.configure(preset, preprocess)
+    contents = [content for content, _ in images]
+    start = time.perf_counter()
+    if batched:
+        texts = []
+        for first in range(0, len(contents), batch_size):
+            texts.extend(ocr_worker.images_to_text(contents[first:first + batch_size]))
+    else:
+        texts = [ocr_worker.image_to_text(content) for content in contents]
+    return texts, (time.perf_counter() - start) / len(contents)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="OCR accuracy and speed by engine configuration")
+    parser.add_argument("--ads", type=int, default=24, help="number of fixture ads to render")
+    parser.add_argument("--images", help="directory of real ad images to use instead")
+    parser.add_argument("--batch", type=int, default=8, help="images per Tesseract run when batched")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Match the pool workers: one Tesseract thread per process
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    rng = random.Random(42)
+    images = load_images(args.images) if args.images else [make_ad(i, rng) for i in range(args.ads)]
+
+    baseline = None
+    print(f"{'configuration':<28}{'ms/image':>10}{'vs current':>12}{'vs truth':>10}")
+    for label, preprocess, preset, batched in CONFIGURATIONS:
+        texts, seconds = run(images, preprocess, preset, batched, args.batch)
+        baseline = baseline or texts
+        vs_current = sum(map(similarity, texts, baseline)) / len(texts)
+        truths = [(text, truth) for text, (_, truth) in zip(texts, images) if truth is not None]
+        vs_truth = f"{sum(similarity(*pair) for pair in truths) / len(truths):>10.3f}" if truths else f"{'-':>10}"
+        print(f"{label:<28}{seconds * 1000:>10.1f}{vs_current:>12.3f}{vs_truth}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Per-job save cost of the JSON Lines and SQLite stores against the legacy save_to_json.
+
+The legacy writer re-reads and rewrites the whole array for every job, so it
+is only run up to LEGACY_LIMIT records; the JSON Lines and SQLite stores are
+run up to 100k records and their cost per job is reported for each window.
+The SQLite store is then queried by employer, closing date range and full
+text to show lookups stay fast as it grows.
+
+Usage:
+    python3 benchmarks/bench_storage.py [records]
+"""
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import open_store  # noqa: E402
+
+WINDOW = 10_000
+LEGACY_LIMIT = 2_000
+LEGACY_WINDOW = 500
+
+
+def make_job(i):
+    """Build a record shaped like the output of scrape_job_page"""
+    return {
+        "Job Reference Number": f"{i:010d}",
+        "Position": f"Senior Software Engineer {i}",
+        "Employer": "Example (Pvt) Ltd",
+        "Opening Date": "Mon Oct 13 2025",
+        "Closing Date": "Sun Oct 26 2025",
+        "SEO Title": f"Senior Software Engineer {i} - topjobs.lk",
+        "Meta Tags": {"description": "Vacancy", "keywords": "software, engineer"},
+        "Extracted Text": "We are looking for an experienced engineer " * 8,
+    }
+
+
+def legacy_save(path, job_data):
+    """The read-modify-write save_to_json used before the JSON Lines store"""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        data = []
+    data.append(job_data)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=4, ensure_ascii=False)
+
+
+def report(label, size, elapsed, count):
+    print(f"{label:<8} {size:>8} records  {elapsed / count * 1e6:>10.1f} us/job", flush=True)
+
+
+def bench_legacy(directory):
+    path = os.path.join(directory, "legacy.json")
+    start = time.perf_counter()
+    for i in range(1, LEGACY_LIMIT + 1):
+        legacy_save(path, make_job(i))
+        if i % LEGACY_WINDOW == 0:
+            report("legacy", i, time.perf_counter() - start, LEGACY_WINDOW)
+            start = time.perf_counter()
+
+
+def bench_jsonl(directory, records):
+    path = os.path.join(directory, "store.jsonl")
+    store = open_store("jsonl", path)
+    start = time.perf_counter()
+    for i in range(1, records + 1):
+        store.append(make_job(i))
+        if i % WINDOW == 0:
+            report("jsonl", i, time.perf_counter() - start, WINDOW)
+            start = time.perf_counter()
+    store.close()
+
+    start = time.perf_counter()
+    exported = store.export_json(os.path.join(directory, "export.json"))
+    print(f"export   {exported:>8} records  {time.perf_counter() - start:>10.2f} s total")
+
+
+def bench_sqlite(directory, records):
+    path = os.path.join(directory, "store.sqlite3")
+    store = open_store("sqlite", path)
+    first_day = datetime.date(2025, 10, 1)
+    start = time.perf_counter()
+    for i in range(1, records + 1):
+        job = make_job(i)
+        job["Employer"] = f"Employer {i % 1000}"
+        job["Closing Date"] = (first_day + datetime.timedelta(days=i % 365)).strftime("%a %b %d %Y")
+        if i % 100 == 0:
+            job["Extracted Text"] += " kubernetes"
+        store.append(job)
+        if i % WINDOW == 0:
+            report("sqlite", i, time.perf_counter() - start, WINDOW)
+            start = time.perf_counter()
+    store.sync()
+
+    queries = {
+        "employer": {"employer": "Employer 42"},
+        "closing week": {"closing_from": "2025-12-01", "closing_to": "2025-12-07"},
+        "employer + week": {"employer": "Employer 42", "closing_from": "2025-12-01", "closing_to": "2025-12-07"},
+        "full text": {"search": "kubernetes", "limit": 100},
+    }
+    for label, query in queries.items():
+        start = time.perf_counter()
+        found = sum(1 for _ in store.query(**query))
+        print(f"query    {label:<16} {found:>7} rows  {(time.perf_counter() - start) * 1000:>8.1f} ms", flush=True)
+    store.close()
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        bench_legacy(directory)
+        bench_jsonl(directory, records)
+        bench_sqlite(directory, records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Local HTTP server that imitates TopJobs for offline benchmarks.
+
+Serves listing pages, detail pages and PNG ad images on the same paths as
+the live site, with configurable latency and error injection. Pages and
+images are generated deterministically from the page number and job
+reference; a directory of recorded responses can be layered on top with
+--recorded, where a request for /some/path?query is answered from
+<recorded>/some/path (the query string is ignored) if that file exists.
+
+Listing pages link to every functional area given with --areas and to each
+of their pages, so crawl.py can discover the whole fixture site.
+
+Listing pages and images carry ETags and honour If-None-Match, so
+incremental crawls and the OCR cache see the same 304s as on the site.
+
+Usage:
+    python3 benchmarks/fixture_server.py --port 8800 --pages 10 --rows 25 --latency-ms 50 --error-rate 0.01
+    TOPJOBS_BASE_URL=http://127.0.0.1:8800 python3 main.py
+"""
+import argparse
+import hashlib
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image, ImageDraw
+
+LISTING_PATH = "/applicant/vacancybyfunctionalarea.jsp"
+DETAIL_PATH = "/employer/JobAdvertismentServlet"
+IMAGE_PREFIX = "/logo/ad_"
+
+
+def job_ref(page, row, area_index=0):
+    return f"{area_index * 1000000 + page * 1000 + row:010d}"
+
+
+def listing_html(page, pages, rows, area="AV", areas=("AV",)):
+    parts = ["<html><head><title>Vacancies</title></head><body><ul>"]
+    for code in areas:
+        parts.append(f"<li><a href='{LISTING_PATH}?FA={code}'>Area {code}</a></li>")
+    parts.append("</ul><table>")
+    area_index = areas.index(area) if area in areas else None
+    if area_index is not None and page <= pages:
+        for row in range(rows):
+            ref = job_ref(page, row, area_index)
+            parts.append(
+                f"<tr id='tr{row}' onclick=\"createAlert('{ref}','DEFZZZ','{ref}','{area}','0')\">"
+                f"<td width='5%' align='center'>{ref}</td>"
+                f"<td width='28%'><h2>Software Engineer {ref}</h2><h1>Employer {row % 7}</h1>"
+                f"<span style='display:none'>DEFZZZ</span><span style='display:none'>{ref}</span></td>"
+                f"<td nowrap>AV</td><td nowrap>Mon Oct {1 + row % 28:02d} 2025</td>"
+                f"<td nowrap>Sun Nov {1 + row % 28:02d} 2025</td></tr>"
+            )
+    parts.append("</table><div class='pages'>")
+    if area_index is not None:
+        for number in range(1, pages + 1):
+            parts.append(f"<a href='{LISTING_PATH}?FA={area}&pageNo={number}'>{number}</a>")
+    parts.append("</div></body></html>")
+    return "".join(parts).encode()
+
+
+def detail_html(ref):
+    return (
+        f"<html><head><title>Software Engineer {ref} - topjobs.lk</title>"
+        f"<meta name='description' content='Software Engineer vacancy {ref}'>"
+        f"<meta name='keywords' content='software, engineer, {ref}'>"
+        f"<meta charset='utf-8'></head><body>"
+        f"<div id='remark'><img src='{IMAGE_PREFIX}{ref}.png'></div></body></html>"
+    ).encode()
+
+
+@lru_cache(maxsize=4096)
+def ad_image(ref):
+    image = Image.new("RGB", (800, 600), "white")
+    draw = ImageDraw.Draw(image)
+    lines = [f"VACANCY {ref}", "Software Engineer", "Apply before the closing date"]
+    for index, line in enumerate(lines):
+        draw.text((40, 60 + index * 60), line, fill="black")
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        config = self.server.config
+        delay = config["latency"] + random.uniform(0, config["jitter"])
+        if delay:
+            time.sleep(delay)
+        if random.random() < config["error_rate"]:
+            self.respond(503, b"injected error", "text/plain")
+            return
+
+        url = urlparse(self.path)
+        recorded = config["recorded"] and os.path.join(config["recorded"], url.path.lstrip("/"))
+        if recorded and os.path.isfile(recorded):
+            with open(recorded, "rb") as file:
+                self.respond(200, file.read(), "text/html; charset=utf-8")
+            return
+
+        query = parse_qs(url.query)
+        if url.path == LISTING_PATH:
+            page = int(query.get("pageNo", ["1"])[0])
+            area = query.get("FA", ["AV"])[0]
+            body = listing_html(page, config["pages"], config["rows"], area, config["areas"])
+            self.respond(200, body, "text/html; charset=utf-8", cacheable=True)
+        elif url.path == DETAIL_PATH and "rid" in query:
+            self.respond(200, detail_html(query["rid"][0]), "text/html; charset=utf-8")
+        elif url.path.startswith(IMAGE_PREFIX) and url.path.endswith(".png"):
+            ref = url.path[len(IMAGE_PREFIX):-len(".png")]
+            self.respond(200, ad_image(ref), "image/png", cacheable=True)
+        else:
+            self.respond(404, b"not found", "text/plain")
+
+    def respond(self, status, body, content_type, cacheable=False):
+        etag = f'"{hashlib.sha1(body).hexdigest()}"' if cacheable else None
+        if etag and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FixtureServer:
+    """Run the fixture site on a background thread"""
+
+    def __init__(self, host="127.0.0.1", port=0, pages=10, rows=25, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, recorded=None, areas=("AV",)):
+        self.httpd = ThreadingHTTPServer((host, port), FixtureHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = {
+            "pages": pages,
+            "rows": rows,
+            "latency": latency_ms / 1000,
+            "jitter": jitter_ms / 1000,
+            "error_rate": error_rate,
+            "recorded": recorded,
+            "areas": tuple(areas),
+        }
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local TopJobs fixture server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=25)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--recorded", help="directory of recorded responses served before generated ones")
+    parser.add_argument("--areas", nargs="+", default=["AV"], help="functional area codes to serve")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = FixtureServer(args.host, args.port, args.pages, args.rows, args.latency_ms,
+                           args.jitter_ms, args.error_rate, args.recorded, args.areas)
+    print(f"Serving TopJobs fixtures on {server.base_url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
@@ -0,0 +1,256 @@
+"""Offline benchmark suite for the scrapers.
+
+Starts the local fixture server, points each scraper at it through
+TOPJOBS_BASE_URL and runs it in a fresh subprocess, so peak RSS is measured
+per mode. Requests, OCR calls and saves are timed by wrapping httpx, the OCR
+entry points and the JSON Lines store, and the suite reports jobs/sec, p50
+and p99 latency per stage (listing, detail, image download, OCR, save) and
+peak RSS for main.py, ocr.py and pipeline.py. RSS is reported twice: for the
+scraper process itself, and for the largest of the child processes it waited
+for (OCR pool workers, Tesseract, chromedriver). getrusage does not sum the
+children, so the two figures are not a total, and a forked child counts the
+pages it shares with the scraper, so its figure is an upper bound.
+
+Usage:
+    python3 benchmarks/run_benchmarks.py --pages 4 --rows 25 --latency-ms 20 --error-rate 0.01
+    python3 benchmarks/run_benchmarks.py --modes pipeline --json results.json
+"""
+import argparse
+import contextlib
+import functools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MODES = ("main", "ocr", "pipeline")
+STAGES = ("listing", "detail", "image", "ocr", "save")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class StageTimer:
+    """Collect latency samples per stage from any thread"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def summary(self):
+        return {
+            stage: {
+                "count": len(self.samples[stage]),
+                "p50_ms": percentile(self.samples[stage], 0.5) * 1000,
+                "p99_ms": percentile(self.samples[stage], 0.99) * 1000,
+            }
+            for stage in STAGES
+            if self.samples[stage]
+        }
+
+
+def stage_for_url(url):
+    path = url.path
+    if path.startswith("/applicant/"):
+        return "listing"
+    if path.startswith("/employer/"):
+        return "detail"
+    if path.startswith("/logo/"):
+        return "image"
+    return None
+
+
+def instrument(timer):
+    """Wrap httpx, the OCR entry points and the store so every stage is timed"""
+    import httpx
+    import main
+    import ocr
+    import ocr_worker
+    import storage
+
+    def timed(stage, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timer.record(stage, time.perf_counter() - start)
+        return wrapper
+
+    def timed_async(stage, function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                timer.record(stage, time.perf_counter() - start)
+        return wrapper
+
+    def timed_future(stage, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            future = function(*args, **kwargs)
+            future.add_done_callback(lambda _: timer.record(stage, time.perf_counter() - start))
+            return future
+        return wrapper
+
+    send = httpx.Client.send
+
+    def client_send(self, request, **kwargs):
+        start = time.perf_counter()
+        try:
+            return send(self, request, **kwargs)
+        finally:
+            stage = stage_for_url(request.url)
+            if stage:
+                timer.record(stage, time.perf_counter() - start)
+
+    async_send = httpx.AsyncClient.send
+
+    async def async_client_send(self, request, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await async_send(self, request, **kwargs)
+        finally:
+            stage = stage_for_url(request.url)
+            if stage:
+                timer.record(stage, time.perf_counter() - start)
+
+    httpx.Client.send = client_send
+    httpx.AsyncClient.send = async_client_send
+    main.image_to_text = timed("ocr", main.image_to_text)
+    main.submit_ocr = timed_future("ocr", main.submit_ocr)
+    ocr.image_to_text = timed("ocr", ocr.image_to_text)
+    ocr_worker.OcrStage.extract = timed_async("ocr", ocr_worker.OcrStage.extract)
+    storage.JsonLinesStore.append = timed("save", storage.JsonLinesStore.append)
+
+
+def run_mode(mode, base_url, pages, ocr_workers):
+    """Run one scraper against the fixture server in this process and return its measurements"""
+    os.environ["TOPJOBS_BASE_URL"] = base_url
+    timer = StageTimer()
+    instrument(timer)
+
+    import asyncio
+    import main
+    import ocr
+    import pipeline
+    from storage import open_store, read_records
+
+    for module in (main, ocr):
+        module.INCREMENTAL = False
+        module.OCR_CACHE = False
+        module.EXPORT_JSON = False
+    main.PAGES_TO_SCRAPE = pages
+    main.OCR_WORKERS = ocr_workers
+    ocr.NUM_PAGES = pages
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if mode == "main":
+            main.main()
+        elif mode == "ocr":
+            ocr.scrape_all_pages()
+        else:
+            store = open_store("jsonl", main.JSONL_FILE)
+            crawler = pipeline.CrawlPipeline(store, listing_url=f"{base_url}{main.LISTING_PATH}",
+                                             ocr_workers=ocr_workers)
+            asyncio.run(crawler.run(range(1, pages + 1)))
+            store.close()
+    elapsed = time.perf_counter() - start
+
+    jobs = sum(1 for _ in read_records(main.JSONL_FILE))
+    return {
+        "mode": mode,
+        "jobs": jobs,
+        "seconds": elapsed,
+        "jobs_per_sec": jobs / elapsed if elapsed else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "child_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        "stages": timer.summary(),
+    }
+
+
+def run_worker(args):
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        result = run_mode(args.worker, args.base_url, args.pages, args.ocr_workers)
+    print(json.dumps(result))
+
+
+def print_report(results):
+    print(f"{'mode':<10}{'jobs':>7}{'jobs/sec':>11}{'parent RSS':>12}{'child RSS':>12}  " +
+          "".join(f"{stage + ' p50/p99 ms':>24}" for stage in STAGES))
+    for result in results:
+        cells = []
+        for stage in STAGES:
+            stats = result["stages"].get(stage)
+            cells.append(f"{stats['p50_ms']:>10.1f} / {stats['p99_ms']:<10.1f}" if stats else f"{'-':>24}")
+        print(f"{result['mode']:<10}{result['jobs']:>7}{result['jobs_per_sec']:>11.2f}"
+              f"{result['peak_rss_mb']:>9.1f} MB{result['child_peak_rss_mb']:>9.1f} MB  " + "  ".join(cells))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline scraper benchmarks against a local fixture server")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=25)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--recorded", help="directory of recorded responses to serve")
+    parser.add_argument("--ocr-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        run_worker(args)
+        return
+
+    from fixture_server import FixtureServer
+
+    results = []
+    with FixtureServer(pages=args.pages, rows=args.rows, latency_ms=args.latency_ms,
+                       jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                       recorded=args.recorded) as server:
+        for mode in args.modes:
+            command = [sys.executable, os.path.abspath(__file__), "--worker", mode,
+                       "--base-url", server.base_url, "--pages", str(args.pages),
+                       "--ocr-workers", str(args.ocr_workers)]
+            completed = subprocess.run(command, capture_output=True, text=True, cwd=ROOT)
+            if completed.returncode != 0:
+                print(f"{mode} failed:\n{completed.stderr}", file=sys.stderr)
+                continue
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
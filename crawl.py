@@ -0,0 +1,233 @@
+"""Full-site crawl sharded across worker processes.
+
+Discovers every functional area linked from a listing page together with
+its page count, and queues one work item per (area, page) in a persistent
+SQLite work queue. Worker processes claim pages from the queue and scrape
+them with main.scrape_page, so adding workers scales the crawl until the
+site's rate limit is reached. main.REQUEST_RATE and main.OCR_WORKERS are split
+evenly between the workers, so the site sees the same request rate and the
+machine runs the same number of OCR processes whatever their number.
+Each worker appends to its own shard of the JSON Lines store; shards are
+merged into the main store when the run ends, or at the start of the next
+run if it did not end cleanly.
+
+The queue is the checkpoint: a page is only marked done once its jobs are
+saved, so after a crash or Ctrl-C running the same command again continues
+with the remaining pages instead of starting over. Use --fresh to discard
+the queue and rediscover the site.
+
+Usage:
+    python3 crawl.py --workers 4
+    python3 crawl.py --workers 4 --areas AV IT
+    python3 crawl.py --status
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import time
+
+import httpx
+from bs4 import BeautifulSoup
+
+import main
+from driver_pool import DriverPool
+from incremental import SEEN_INDEX_FILE, SeenIndex
+from metrics import metrics
+from ocr_cache import OCR_CACHE_FILE, OcrCache
+from ocr_worker import OcrStage, configure, engine_fingerprint
+from scheduler import scheduler
+from storage import migrate_legacy_json, open_store, read_records
+from topjobs import find_functional_areas, find_job_rows, find_page_count, listing_url
+from work_queue import FAILED, WORK_QUEUE_FILE, WorkQueue, worker_name
+
+DEFAULT_WORKERS = 2
+SEED_AREA = "AV"  # Listing whose navigation links to every functional area
+
+
+def shard_path(index):
+    root, extension = os.path.splitext(main.JSONL_FILE)
+    return f"{root}.shard{index}{extension}"
+
+
+def merge_shards(store):
+    """Move records written by worker processes into the main store"""
+    root, extension = os.path.splitext(main.JSONL_FILE)
+    merged = 0
+    for path in sorted(glob.glob(f"{root}.shard*{extension}")):
+        for record in read_records(path):
+            store.append(record)
+            merged += 1
+        store.sync()
+        os.remove(path)
+    return merged
+
+
+def discover(client, base_url, areas=None):
+    """Return (code, name, page count) for the given or all linked functional areas"""
+    if not areas:
+        response = scheduler.request(client, "GET", listing_url(base_url, SEED_AREA, 1))
+        response.raise_for_status()
+        found = find_functional_areas(BeautifulSoup(response.content, "html.parser"))
+        areas = found or {SEED_AREA: SEED_AREA}
+    else:
+        areas = {code: code for code in areas}
+
+    discovered = []
+    for code, name in areas.items():
+        response = scheduler.request(client, "GET", listing_url(base_url, code, 1))
+        response.raise_for_status()
+        soup = BeautifulSoup(response.content, "html.parser")
+        pages = find_page_count(soup) if find_job_rows(soup) else 0
+        main.print_progress(f"Area {code} ({name}): {pages} pages")
+        discovered.append((code, name, pages))
+    return discovered
+
+
+def run_worker(index, workers, base_url, queue_path, incremental, ocr_cache_enabled):
+    """Claim and scrape listing pages until the queue is empty"""
+    name = worker_name(index)
+    # Each process has its own scheduler; together they keep to the configured rate
+    scheduler.configure(rate=main.REQUEST_RATE / workers)
+    configure(main.OCR_PRESET, main.OCR_PREPROCESS)
+    queue = WorkQueue(queue_path)
+    main.store = open_store("jsonl", shard_path(index))
+    if incremental:
+        # Commit every job so the other workers' connections are never kept waiting on the index
+        main.seen_index = SeenIndex(SEEN_INDEX_FILE, commit_every=1)
+    if ocr_cache_enabled:
+        main.ocr_cache = OcrCache(OCR_CACHE_FILE, engine_fingerprint())
+    # The workers share the machine's cores the same way they share the request rate
+    main.ocr_stage = OcrStage(max(1, (main.OCR_WORKERS or os.cpu_count() or 1) // workers))
+    main.driver_pool = DriverPool(main.browser_options(), size=1, warm=False)
+
+    item = None
+    try:
+        while True:
+            item = queue.claim(name)
+            if item is None:
+                break
+            area, page_num = item
+            new_jobs = main.scrape_page(listing_url(base_url, area, page_num), page_num)
+            # A page only counts as scraped once its partial records have their text
+            main.wait_for_ocr()
+            main.store.sync()
+            if main.seen_index is not None:
+                # Persist the page's validators, or drop them if one of its jobs failed
+                main.seen_index.commit_listings()
+            if new_jobs is None:
+                queue.fail(area, page_num, "page error")
+                # Don't spend the page's attempts while the site's circuit is open
+                time.sleep(scheduler.reset_delay())
+            else:
+                queue.complete(area, page_num, new_jobs)
+                if incremental and new_jobs == 0:
+                    main.print_progress(f"No new jobs on {area} page {page_num}, skipping the rest of {area}")
+                    queue.skip_after(area, page_num)
+            item = None
+    except KeyboardInterrupt:
+        if item is not None:
+            queue.release(*item)
+    finally:
+        main.driver_pool.close()
+        main.ocr_stage.shutdown()
+        main.store.close()
+        if main.ocr_cache:
+            main.ocr_cache.close()
+        if main.seen_index is not None:
+            main.seen_index.close()
+        queue.close()
+        metrics.write_summary(f"run_summary.worker{index}.json")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Resumable full-site TopJobs crawl across worker processes")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--base-url", default=main.BASE_URL)
+    parser.add_argument("--areas", nargs="+", help="functional area codes to crawl instead of all of them")
+    parser.add_argument("--queue", default=WORK_QUEUE_FILE, help="work queue file")
+    parser.add_argument("--fresh", action="store_true", help="discard the queue and rediscover the site")
+    parser.add_argument("--retry-failed", action="store_true", help="requeue pages that failed too often")
+    parser.add_argument("--status", action="store_true", help="print queue progress and exit")
+    parser.add_argument("--no-incremental", action="store_true")
+    parser.add_argument("--no-ocr-cache", action="store_true")
+    return parser.parse_args()
+
+
+def print_status(queue):
+    progress = queue.progress()
+    main.print_progress(f"{len(queue.areas())} areas, pages by status: {progress}")
+
+
+def crawl():
+    args = parse_args()
+    queue = WorkQueue(args.queue)
+    if args.status:
+        print_status(queue)
+        queue.close()
+        return
+
+    start_time = time.time()
+    store = open_store(main.STORAGE_BACKEND, main.store_file())
+    merged = merge_shards(store)
+    if merged:
+        main.print_progress(f"Merged {merged} records left by an interrupted run")
+    migrate_legacy_json(store, main.JSON_FILE)
+    if not args.no_incremental:
+        seen_index = SeenIndex(SEEN_INDEX_FILE)
+        seen_index.seed(store)
+        seen_index.close()
+
+    if args.fresh:
+        queue.reset()
+    # Pages claimed by workers of a run that crashed
+    released = queue.release_claims()
+    if args.retry_failed:
+        queue.retry_failed()
+    known = {code for code, _, _ in queue.areas()}
+    if known:
+        main.print_progress(f"Resuming crawl ({released} interrupted pages requeued)")
+    missing = [code for code in args.areas or () if code not in known]
+    if not known or missing:
+        main.print_progress("Discovering functional areas")
+        scheduler.configure(rate=main.REQUEST_RATE)
+        with httpx.Client(headers=main.HEADERS, timeout=10, follow_redirects=True) as client:
+            for code, name, pages in discover(client, args.base_url, missing):
+                queue.add_area(code, name, pages)
+    print_status(queue)
+
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=run_worker,
+                        args=(index, args.workers, args.base_url, args.queue, not args.no_incremental,
+                              not args.no_ocr_cache))
+        for index in range(args.workers)
+    ]
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if queue.remaining() == 0:
+            main.print_progress("Crawl completed")
+    except KeyboardInterrupt:
+        main.print_progress("Crawl interrupted; run again to resume")
+        for worker in workers:
+            worker.join()
+    finally:
+        merged = merge_shards(store)
+        store.close()
+        if main.EXPORT_JSON:
+            exported = store.export_json(main.JSON_FILE)
+            main.print_progress(f"Exported {exported} jobs to {main.JSON_FILE}")
+        print_status(queue)
+        failed = queue.progress().get(FAILED, 0)
+        if failed:
+            main.print_progress(f"{failed} pages failed; rerun with --retry-failed to try them again")
+        queue.close()
+        duration = time.time() - start_time
+        main.print_progress(f"Saved {merged} jobs in {duration:.2f} seconds")
+
+
+if __name__ == "__main__":
+    crawl()
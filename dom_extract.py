@@ -0,0 +1,69 @@
+"""Batched DOM extraction through driver.execute_script.
+
+Reading a job field by field costs one WebDriver HTTP round trip per
+find_element, .text and get_attribute call. These helpers collect every
+listing row of a page, or every field of a detail tab, in a single
+execute_script call that returns JSON, and post-process it into the same
+shape scrape_job_page produces.
+"""
+
+LISTING_ROWS_SCRIPT = """
+const text = (element) => element ? element.innerText.trim() : null;
+return Array.from(document.querySelectorAll("tr[id^='tr']")).map((row) => ({
+    element: row,
+    id: row.id,
+    ref: text(row.querySelector("td[width='5%'][align='center']")),
+    description: text(row.querySelector("td[width='28%']")),
+    employer: text(row.querySelector("h1")),
+    dates: Array.from(row.querySelectorAll("td[nowrap]")).map(text),
+}));
+"""
+
+DETAIL_SCRIPT = """
+const image = document.querySelector("#remark img");
+return {
+    title: document.title,
+    meta: Array.from(document.querySelectorAll("meta[name]")).map(
+        (tag) => [tag.getAttribute("name"), tag.getAttribute("content")]),
+    image: image ? image.src : null,
+};
+"""
+
+
+def _position(description):
+    for part in (description or "").split("\n"):
+        part = part.strip()
+        if part and part != "DEFZZZ" and not part.startswith("000") and part.lower() != "company name withheld":
+            return part
+    return "N/A"
+
+
+def extract_listing_rows(driver):
+    """Return the listing fields and WebElement of every job row on the page in one call"""
+    rows = []
+    for row in driver.execute_script(LISTING_ROWS_SCRIPT):
+        dates = row["dates"]
+        rows.append({
+            "id": row["id"],
+            "element": row["element"],
+            "Job Reference Number": row["ref"],
+            "Position": _position(row["description"]),
+            "Employer": row["employer"],
+            "Opening Date": dates[1] if len(dates) > 1 else "N/A",
+            "Closing Date": dates[2] if len(dates) > 2 else "N/A",
+        })
+    return rows
+
+
+def extract_detail(driver):
+    """Return the title, named meta tags and ad image src of the current tab in one call"""
+    detail = driver.execute_script(DETAIL_SCRIPT)
+    meta_tags = {}
+    for name, content in detail["meta"]:
+        if name:
+            meta_tags[name] = content
+    return {
+        "SEO Title": detail["title"],
+        "Meta Tags": meta_tags,
+        "Image Source": detail["image"],
+    }
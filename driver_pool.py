@@ -0,0 +1,167 @@
+"""Pool of warm headless Chrome instances.
+
+Starting Chrome is one of the biggest fixed costs of a crawl, so instead of
+launching a browser per listing page the scrapers lease one from a
+DriverPool. Drivers are health-checked when leased, stray tabs are closed
+when they are returned, and each driver is recycled after a configurable
+number of leases or once its process tree grows past a memory limit.
+"""
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from selenium import webdriver
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_USES = 50
+DEFAULT_MAX_MEMORY_MB = 1024
+
+
+def _child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as file:
+            return [int(child) for child in file.read().split()]
+    except OSError:
+        return []
+
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss_mb(pid):
+    """Resident memory of a process and all its descendants, or None where /proc is unavailable"""
+    if not os.path.exists(f"/proc/{pid}"):
+        return None
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += _rss_kb(current)
+        stack.extend(_child_pids(current))
+    return total / 1024
+
+
+class PooledDriver:
+    """A Chrome WebDriver together with its lease count"""
+
+    def __init__(self, options):
+        self.driver = webdriver.Chrome(options=options)
+        self.uses = 0
+
+    def is_healthy(self):
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def memory_mb(self):
+        process = getattr(self.driver.service, "process", None)
+        return process_tree_rss_mb(process.pid) if process else None
+
+    def reset(self):
+        """Close every tab but the first, leaving its page loaded for the next lease"""
+        handles = self.driver.window_handles
+        for handle in handles[1:]:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        self.driver.switch_to.window(handles[0])
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+
+
+class DriverPool:
+    """Lease warm Chrome drivers to page workers"""
+
+    def __init__(self, options, size=DEFAULT_POOL_SIZE, max_uses=DEFAULT_MAX_USES,
+                 max_memory_mb=DEFAULT_MAX_MEMORY_MB, warm=True):
+        self.options = options
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.started = 0
+        self.recycled = 0
+        self._idle = queue.LifoQueue()
+        self._all = set()
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(size)
+        if warm:
+            with ThreadPoolExecutor(max_workers=size) as executor:
+                for pooled in executor.map(lambda _: self._start(), range(size)):
+                    self._idle.put(pooled)
+
+    def _start(self):
+        pooled = PooledDriver(self.options)
+        with self._lock:
+            self._all.add(pooled)
+            self.started += 1
+        return pooled
+
+    def _discard(self, pooled):
+        with self._lock:
+            self._all.discard(pooled)
+            self.recycled += 1
+        pooled.quit()
+
+    def _acquire(self):
+        try:
+            pooled = self._idle.get_nowait()
+        except queue.Empty:
+            return self._start()
+        if pooled.is_healthy():
+            return pooled
+        self._discard(pooled)
+        return self._start()
+
+    def _release(self, pooled):
+        memory = pooled.memory_mb()
+        if (pooled.uses >= self.max_uses
+                or (memory is not None and memory > self.max_memory_mb)):
+            self._discard(pooled)
+            return
+        try:
+            pooled.reset()
+        except Exception:
+            self._discard(pooled)
+            return
+        self._idle.put(pooled)
+
+    @contextmanager
+    def lease(self):
+        """Borrow a driver for the duration of a with block"""
+        self._semaphore.acquire()
+        try:
+            pooled = self._acquire()
+            pooled.uses += 1
+            try:
+                yield pooled.driver
+            finally:
+                self._release(pooled)
+        finally:
+            self._semaphore.release()
+
+    def close(self):
+        with self._lock:
+            drivers = list(self._all)
+            self._all.clear()
+        for pooled in drivers:
+            pooled.quit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
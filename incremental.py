@@ -0,0 +1,130 @@
+"""Seen-job index for incremental crawls.
+
+Remembers every Job Reference Number already scraped together with its
+closing date, so a refresh can skip detail and OCR work for jobs it already
+holds (a changed closing date counts as a new posting) and stop paginating at
+the first page with nothing new. It also keeps the ETag / Last-Modified
+validators of listing pages so unchanged pages can be requested
+conditionally; validators are only written once a run has finished, so a
+crash never marks a half-processed page as up to date, and a page with any
+job that failed is forgotten so the next run fetches it in full.
+"""
+import sqlite3
+import threading
+import time
+
+SEEN_INDEX_FILE = "seen_jobs.sqlite3"
+COMMIT_EVERY = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen_jobs (
+    job_ref TEXT PRIMARY KEY,
+    closing_date TEXT,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS listing_validators (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT
+);
+"""
+
+
+class SeenIndex:
+    """SQLite-backed index of scraped jobs and listing page validators"""
+
+    def __init__(self, path=SEEN_INDEX_FILE, commit_every=COMMIT_EVERY):
+        self.path = path
+        self.commit_every = commit_every
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._jobs = dict(self._db.execute("SELECT job_ref, closing_date FROM seen_jobs"))
+        self._pending = 0
+        self._validators = {}
+        self._forgotten = set()
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def seed(self, records):
+        """Populate an empty index from previously stored records"""
+        if self._jobs:
+            return 0
+        for record in records:
+            # Partial records whose OCR never finished are scraped again
+            if "Extracted Text" in record and record["Extracted Text"] is None:
+                continue
+            self.add(record.get("Job Reference Number"), record.get("Closing Date"))
+        self._db.commit()
+        return len(self._jobs)
+
+    def is_known(self, job_ref, closing_date):
+        """Whether a job has already been scraped with the same closing date"""
+        known = job_ref in self._jobs and self._jobs[job_ref] == closing_date
+        if known:
+            with self._lock:
+                self.skipped += 1
+        return known
+
+    def add(self, job_ref, closing_date):
+        if not job_ref or job_ref == "N/A":
+            return
+        with self._lock:
+            self._jobs[job_ref] = closing_date
+            self._db.execute(
+                "INSERT OR REPLACE INTO seen_jobs (job_ref, closing_date, last_seen) VALUES (?, ?, ?)",
+                (job_ref, closing_date, time.time()),
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._db.commit()
+                self._pending = 0
+
+    def listing_headers(self, url):
+        """Conditional request headers for a listing page fetched in an earlier run"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified FROM listing_validators WHERE url = ?", (url,)
+            ).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def remember_listing(self, url, response_headers):
+        """Hold a listing page's validators until commit_listings is called"""
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        if etag or last_modified:
+            with self._lock:
+                if url not in self._forgotten:
+                    self._validators[url] = (etag, last_modified)
+
+    def forget_listing(self, url):
+        """Drop a listing page's validators for good after one of its jobs failed"""
+        with self._lock:
+            self._forgotten.add(url)
+            self._validators.pop(url, None)
+
+    def commit_listings(self):
+        """Persist the listing validators seen in a run that completed"""
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO listing_validators (url, etag, last_modified) VALUES (?, ?, ?)",
+                [(url, etag, last_modified) for url, (etag, last_modified) in self._validators.items()],
+            )
+            self._db.executemany("DELETE FROM listing_validators WHERE url = ?",
+                                 [(url,) for url in self._forgotten])
+            self._db.commit()
+            self._validators.clear()
+            self._forgotten.clear()
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
@@ -0,0 +1,96 @@
+"""Lightweight Chrome rendering profile.
+
+When Selenium is needed, only the DOM matters: stylesheets, fonts and media
+(and, on listing pages, images) are blocked through the Chrome DevTools
+Protocol, pages load with the "eager" strategy, and the ad image that the
+detail tab downloads anyway is read back from the browser's network log
+instead of being fetched a second time for OCR. Scripts are left alone
+because the listing rows open their detail tab from an onclick handler.
+
+Blocking applies per tab, so a detail tab opened by clicking a row would
+request its stylesheets and fonts before the block could be set. Instead
+the row's handler is run with window.open captured, and the detail URL is
+loaded in a blank tab that already blocks them.
+"""
+import base64
+import json
+
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
+
+BLOCKED_URL_PATTERNS = {
+    "stylesheet": ["*.css", "*.css?*"],
+    "font": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "media": ["*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav"],
+    "image": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico"],
+}
+LISTING_BLOCKED_TYPES = ("stylesheet", "font", "media", "image")
+DETAIL_BLOCKED_TYPES = ("stylesheet", "font", "media")
+
+
+def lightweight_options(base_options):
+    """Copy Chrome options with eager page loads and network logging enabled"""
+    options = Options()
+    for argument in base_options.arguments:
+        options.add_argument(argument)
+    options.page_load_strategy = "eager"
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+def block_resources(driver, resource_types):
+    """Block requests for the given resource types in the current tab"""
+    patterns = [pattern for resource_type in resource_types for pattern in BLOCKED_URL_PATTERNS[resource_type]]
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+
+CAPTURE_WINDOW_OPEN_SCRIPT = """
+const open = window.open;
+let captured = null;
+window.open = (url) => { captured = url; return null; };
+try { arguments[0].click(); } finally { window.open = open; }
+return captured ? new URL(captured, document.baseURI).href : null;
+"""
+
+
+def open_blocked_tab(driver, element, resource_types):
+    """Open the page a listing row opens with window.open in a new tab that blocks the given resource types
+
+    The row is clicked exactly once. Returns False when its handler did not
+    call window.open; anything the click opened some other way is left for
+    the caller to switch to, since clicking again would open a second tab.
+    """
+    url = driver.execute_script(CAPTURE_WINDOW_OPEN_SCRIPT, element)
+    if not url:
+        return False
+    driver.switch_to.new_window("tab")
+    block_resources(driver, resource_types)
+    driver.get(url)
+    return True
+
+
+def _image_loaded(driver):
+    return driver.execute_script(
+        "const image = document.querySelector('#remark img'); return !image || image.complete;")
+
+
+def captured_response_body(driver, url, timeout=10):
+    """Return the body of a response the current tab already received, or None"""
+    WebDriverWait(driver, timeout).until(_image_loaded)
+    request_id = None
+    for entry in driver.get_log("performance"):
+        if "Network.responseReceived" not in entry["message"]:
+            continue
+        message = json.loads(entry["message"])["message"]
+        if message["method"] == "Network.responseReceived" and message["params"]["response"]["url"] == url:
+            request_id = message["params"]["requestId"]
+    if request_id is None:
+        return None
+    try:
+        body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+    except Exception:
+        return None
+    if body.get("base64Encoded"):
+        return base64.b64decode(body["body"])
+    return body["body"].encode("latin-1")
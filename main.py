@@ -1,23 +1,62 @@
-import json
 import httpx
 from bs4 import BeautifulSoup
-from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import pytesseract
-from PIL import Image
-from io import BytesIO
+import os
 import time
 import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dom_extract import extract_detail, extract_listing_rows
+from driver_pool import DriverPool
+from incremental import SEEN_INDEX_FILE, SeenIndex
+from lightweight import (DETAIL_BLOCKED_TYPES, LISTING_BLOCKED_TYPES, block_resources,
+                         captured_response_body, lightweight_options, open_blocked_tab)
+from metrics import METRICS_FILE, SUMMARY_FILE, metrics
+from ocr_cache import OCR_CACHE_FILE, OcrCache
+from ocr_worker import OcrStage, configure, engine_fingerprint, image_to_text
+from scheduler import TransientError, scheduler
+from storage import migrate_legacy_json, open_store
+from topjobs import detail_url_for_row, fetch_job_details, find_job_rows, parse_listing_row
 
 # Configuration
 pytesseract.pytesseract.tesseract_cmd = r'/usr/bin/tesseract'
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
 }
+BASE_URL = os.environ.get("TOPJOBS_BASE_URL", "https://www.topjobs.lk")  # Point at a local fixture server for benchmarks
+LISTING_PATH = "/applicant/vacancybyfunctionalarea.jsp?FA=AV&pageNo="
+LISTING_URL = f"{BASE_URL}{LISTING_PATH}"
+PAGES_TO_SCRAPE = 2  # Start with 2 pages for testing
 JSON_FILE = "scraped_data.json"
+JSONL_FILE = "scraped_data.jsonl"
+SQLITE_FILE = "scraped_data.sqlite3"
+STORAGE_BACKEND = "jsonl"  # "sqlite" for an indexed, queryable store (see storage.py query)
+EXPORT_JSON = True  # Rewrite the legacy JSON array from the store at the end of a run
+store = None
+OCR_CACHE = True  # Reuse OCR results for images seen in earlier runs
+ocr_cache = None
+OCR_PRESET = "default"  # Tesseract preset from ocr_worker.PRESETS, e.g. "block"
+OCR_PREPROCESS = False  # Grayscale, downscale, binarise and crop ads before OCR
+OCR_WORKERS = None  # OCR processes shared by the page workers; None uses every CPU
+ocr_stage = None  # Without one, OCR runs inline on the thread that scraped the job
+ocr_pending = 0  # Jobs saved as partial records whose text has not been filled in yet
+ocr_done = threading.Condition()
+BROWSERLESS = True  # Fetch detail pages over HTTP; Chrome is only used for rows where that fails
+INCREMENTAL = True  # Skip jobs scraped in earlier runs and stop at the first page without new ones
+seen_index = None
+KNOWN_JOB = {}  # Returned by scrape_job_page for jobs already in the seen index; falsy, so never saved
+PAGE_WORKERS = 2  # Listing pages processed in parallel, each with a Chrome leased from the pool
+driver_pool = None
+BATCHED_EXTRACTION = True  # Read each page's rows and each detail tab with one execute_script call
+LIGHTWEIGHT_RENDERING = True  # Block non-essential resources, load eagerly and reuse the browser's ad image
+METRICS_PORT = None  # Serve /metrics and /summary on this port while scraping
+PROFILE_STAGES = ()  # Stages to profile with cProfile, e.g. ("ocr",); written to profile_<stage>.prof
+REQUEST_RATE = 20.0  # Requests per second per host across all workers (see scheduler.py)
+REQUEUE_ROUNDS = 1  # Extra passes over jobs and pages whose requests kept failing after retries
 
 # Set up Chrome options
 chrome_options = Options()
@@ -27,41 +66,151 @@ chrome_options.add_argument("--no-sandbox")
 chrome_options.add_argument("--disable-dev-shm-usage")
 chrome_options.add_argument("window-size=1920,1080")
 
+def browser_options():
+    """Chrome options for pooled drivers"""
+    return lightweight_options(chrome_options) if LIGHTWEIGHT_RENDERING else chrome_options
+
+def load_listing(driver, url):
+    """Load a listing page in a leased driver and wait for the job rows"""
+    with metrics.timed("listing_fetch"):
+        if LIGHTWEIGHT_RENDERING:
+            block_resources(driver, LISTING_BLOCKED_TYPES)
+        with scheduler.slot(url):
+            driver.get(url)
+            WebDriverWait(driver, 20).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "tr[id^='tr']")))
+
+def store_file():
+    """Path of the record store for the configured backend"""
+    return SQLITE_FILE if STORAGE_BACKEND == "sqlite" else JSONL_FILE
+
+def forget_listing(url):
+    """Make the next run fetch a listing page in full because one of its jobs failed"""
+    if seen_index is not None:
+        seen_index.forget_listing(url)
+
 def print_progress(message):
     """Print progress messages with timestamp"""
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {message}", flush=True)
 
 def save_to_json(job_data):
-    """Save job data to JSON file"""
+    """Append job data to the record store
+
+    A job whose text is still a Future from the OCR stage is saved as a
+    partial record and added to the seen index once its text is filled in.
+    """
+    global ocr_pending
+    text = job_data["Extracted Text"]
     try:
-        # Load existing data or create new list
-        try:
-            with open(JSON_FILE, "r", encoding="utf-8") as file:
-                data = json.load(file)
-        except (FileNotFoundError, json.JSONDecodeError):
-            data = []
-        
-        # Append new job data
-        data.append(job_data)
-        
-        # Save back to file
-        with open(JSON_FILE, "w", encoding="utf-8") as file:
-            json.dump(data, file, indent=4, ensure_ascii=False)
-            
+        with metrics.timed("save"):
+            if isinstance(text, Future):
+                store.append({**job_data, "Extracted Text": None})
+            else:
+                store.append(job_data)
+                if seen_index is not None:
+                    seen_index.add(job_data["Job Reference Number"], job_data["Closing Date"])
+        metrics.inc("jobs_saved_total")
+    except Exception as e:
+        print_progress(f"Error saving job: {e}")
+        return
+    if isinstance(text, Future):
+        with ocr_done:
+            ocr_pending += 1
+        text.add_done_callback(lambda future: fill_in_text(job_data, future.result()))
+
+def fill_in_text(job_data, extracted_text):
+    """Store the OCR text of a job saved as a partial record"""
+    global ocr_pending
+    try:
+        with metrics.timed("save"):
+            store.update(job_data["Job Reference Number"], {"Extracted Text": extracted_text})
+            if seen_index is not None:
+                seen_index.add(job_data["Job Reference Number"], job_data["Closing Date"])
     except Exception as e:
-        print_progress(f"Error saving to JSON: {e}")
+        print_progress(f"Error saving job: {e}")
+    finally:
+        with ocr_done:
+            ocr_pending -= 1
+            ocr_done.notify_all()
+
+def wait_for_ocr():
+    """Block until every partial record saved so far has its text filled in"""
+    with ocr_done:
+        ocr_done.wait_for(lambda: ocr_pending == 0)
+
+def fetch_image(client, image_url):
+    """Download an image, revalidating against the OCR cache when possible"""
+    with metrics.timed("image_download"):
+        etag = ocr_cache.etag_for(image_url) if ocr_cache else None
+        headers = {**HEADERS, "If-None-Match": etag} if etag else HEADERS
+        response = scheduler.request(client, "GET", image_url, headers=headers, timeout=10)
+        if response.status_code == 304:
+            text = ocr_cache.get_by_url(image_url)
+            if text is not None:
+                metrics.inc("ocr_cache_hits_total")
+                return response, text
+            response = scheduler.request(client, "GET", image_url, headers=HEADERS, timeout=10)
+        response.raise_for_status()
+        return response, None
+
+def run_ocr(content):
+    """OCR image bytes as one timed call of the ocr stage"""
+    with metrics.timed("ocr"):
+        return image_to_text(content)
 
-def extract_image_text(image_url):
-    """Extract text from image using OCR"""
+def submit_ocr(content, image_url, etag=None):
+    """Hand image bytes to the OCR stage, returning a Future for their text that is cached once known"""
+    started = time.perf_counter()
+    text_future = Future()
+
+    def done(future):
+        metrics.observe("ocr", time.perf_counter() - started)
+        text = "N/A"
+        try:
+            text = future.result()
+            if ocr_cache is not None:
+                ocr_cache.put(content, text, image_url, etag)
+        except Exception as e:
+            metrics.error("ocr", e)
+            print_progress(f"OCR Error: {e}")
+        text_future.set_result(text)
+
+    ocr_stage.submit(content).add_done_callback(done)
+    return text_future
+
+def extract_image_text(image_url, client=None, content=None):
+    """Extract text from image using OCR, reusing the given httpx client or already downloaded bytes if any
+
+    With an OCR stage running, images whose text is not cached are handed to
+    it and a Future for the text is returned instead; save_to_json fills it in.
+    """
     try:
         print_progress(f"Processing image: {image_url}")
-        with httpx.Client() as client:
-            response = client.get(image_url, headers=HEADERS, timeout=10)
-            response.raise_for_status()
-            image = Image.open(BytesIO(response.content))
-            text = pytesseract.image_to_string(image).replace("\n", " ").strip()
-            return text if text else "N/A"
+        etag = None
+        if content is None:
+            if client is None:
+                with httpx.Client() as client:
+                    response, text = fetch_image(client, image_url)
+            else:
+                response, text = fetch_image(client, image_url)
+            if text is not None:
+                return text
+            content, etag = response.content, response.headers.get("ETag")
+        text = ocr_cache.get(content) if ocr_cache is not None else None
+        if text is not None:
+            metrics.inc("ocr_cache_hits_total")
+            return text
+        if ocr_stage is not None:
+            return submit_ocr(content, image_url, etag)
+
+        text = run_ocr(content)
+        if ocr_cache is not None:
+            ocr_cache.put(content, text, image_url, etag)
+        return text
+    except TransientError:
+        # Left for the caller to retry instead of saving the job as "N/A"
+        raise
     except Exception as e:
         print_progress(f"OCR Error: {e}")
         return "N/A"
@@ -89,6 +238,11 @@ def scrape_job_page(driver, job_element):
         opening_date = date_elements[1].text.strip() if len(date_elements) > 1 else "N/A"
         closing_date = date_elements[2].text.strip() if len(date_elements) > 2 else "N/A"
         
+        if seen_index is not None and seen_index.is_known(job_ref, closing_date):
+            print_progress(f"Skipping known job {job_ref}")
+            metrics.inc("jobs_skipped_total")
+            return KNOWN_JOB
+        
         # Click to open details
         job_element.click()
         
@@ -114,6 +268,8 @@ def scrape_job_page(driver, job_element):
                 image_src = img_elements[0].get_attribute("src")
                 if image_src:
                     extracted_text = extract_image_text(image_src)
+        except TransientError:
+            raise
         except Exception as e:
             print_progress(f"Image processing error: {e}")
         
@@ -131,6 +287,8 @@ def scrape_job_page(driver, job_element):
         
         return job_data
         
+    except TransientError:
+        raise
     except Exception as e:
         print_progress(f"Job processing error: {e}")
         return None
@@ -142,57 +300,325 @@ def scrape_job_page(driver, job_element):
         if len(driver.window_handles) > 0:
             driver.switch_to.window(driver.window_handles[0])
 
+def open_job_row(driver, row, main_handle):
+    """Open a row returned by extract_listing_rows in a detail tab
+
+    Returns the job data without its extracted text, the ad image URL and
+    the image bytes if the browser already downloaded them.
+    """
+    if None in (row["Job Reference Number"], row["Employer"]):
+        raise ValueError(f"incomplete listing row {row['id']}")
+    try:
+        with metrics.timed("detail_load"), scheduler.slot(driver.current_url):
+            if LIGHTWEIGHT_RENDERING:
+                # Load the details in a tab that blocks resources from the start when possible
+                opened = open_blocked_tab(driver, row["element"], DETAIL_BLOCKED_TYPES)
+            else:
+                # Click to open details
+                row["element"].click()
+                opened = False
+            if not opened:
+                # Switch to the tab the click opened
+                new_handles = WebDriverWait(driver, 10).until(
+                    lambda d: [handle for handle in d.window_handles if handle != main_handle])
+                driver.switch_to.window(new_handles[0])
+                if LIGHTWEIGHT_RENDERING:
+                    block_resources(driver, DETAIL_BLOCKED_TYPES)
+            WebDriverWait(driver, 10).until(lambda d: d.execute_script("return document.readyState") != "loading")
+            
+            # Title, meta tags and image src in one round trip
+            details = extract_detail(driver)
+        
+        image_src = details["Image Source"]
+        content = None
+        if image_src and LIGHTWEIGHT_RENDERING:
+            with metrics.timed("image_download"):
+                content = captured_response_body(driver, image_src)
+        
+        job_data = {
+            "Job Reference Number": row["Job Reference Number"],
+            "Position": row["Position"],
+            "Employer": row["Employer"],
+            "Opening Date": row["Opening Date"],
+            "Closing Date": row["Closing Date"],
+            "SEO Title": details["SEO Title"],
+            "Meta Tags": details["Meta Tags"],
+        }
+        return job_data, image_src, content
+        
+    finally:
+        # Clean up tabs
+        handles = driver.window_handles
+        if len(handles) > 1:
+            for handle in handles:
+                if handle != main_handle:
+                    driver.switch_to.window(handle)
+                    driver.close()
+            driver.switch_to.window(main_handle)
+
+def scrape_job_row(driver, row, main_handle):
+    """Scrape individual job details from a row returned by extract_listing_rows"""
+    try:
+        job_ref = row["Job Reference Number"]
+        if seen_index is not None and seen_index.is_known(job_ref, row["Closing Date"]):
+            print_progress(f"Skipping known job {job_ref}")
+            metrics.inc("jobs_skipped_total")
+            return KNOWN_JOB
+        
+        job_data, image_src, content = open_job_row(driver, row, main_handle)
+        
+        # Image text extraction, from the bytes the browser already downloaded when possible
+        job_data["Extracted Text"] = extract_image_text(image_src, content=content) if image_src else "N/A"
+        return job_data
+        
+    except TransientError:
+        raise
+    except Exception as e:
+        print_progress(f"Job processing error: {e}")
+        return None
+
+def scrape_job_browserless(client, job_data, job_row, url):
+    """Scrape individual job details over HTTP without a browser"""
+    detail_url = detail_url_for_row(job_row, url)
+    if not detail_url:
+        return None
+
+    with metrics.timed("detail_load"):
+        details = fetch_job_details(client, detail_url)
+    if details is None:
+        return None
+
+    image_src = details["Image Source"]
+    job_data.update({
+        "SEO Title": details["SEO Title"],
+        "Meta Tags": details["Meta Tags"],
+        "Extracted Text": extract_image_text(image_src, client) if image_src else "N/A"
+    })
+    return job_data
+
+def scrape_page_browserless(url, page_num):
+    """Scrape a page over HTTP, returning the row ids that still need the browser and the number of new jobs"""
+    with httpx.Client(headers=HEADERS, timeout=10, follow_redirects=True) as client:
+        headers = seen_index.listing_headers(url) if seen_index is not None else None
+        with metrics.timed("listing_fetch"):
+            response = scheduler.request(client, "GET", url, headers=headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+        if response.status_code == 304:
+            print_progress(f"Page {page_num} not modified")
+            metrics.inc("listings_not_modified_total")
+            return set(), 0
+        with metrics.timed("row_parse"):
+            job_rows = find_job_rows(BeautifulSoup(response.content, "html.parser"))
+        if not job_rows:
+            raise ValueError("no job rows in listing HTML")
+        print_progress(f"Found {len(job_rows)} jobs on page {page_num}")
+
+        fallback_ids = set()
+        new_jobs = 0
+        pending = []
+        for i, job_row in enumerate(job_rows, 1):
+            with metrics.timed("row_parse"):
+                job_data = parse_listing_row(job_row)
+            if seen_index is not None and seen_index.is_known(job_data["Job Reference Number"], job_data["Closing Date"]):
+                metrics.inc("jobs_skipped_total")
+                continue
+            new_jobs += 1
+            print_progress(f"Processing job {i}/{len(job_rows)} on page {page_num}")
+            pending.append((job_data, job_row))
+
+        # Jobs whose requests keep failing go to the back of the queue for another round
+        error = None
+        for round_num in range(REQUEUE_ROUNDS + 1):
+            if round_num:
+                time.sleep(scheduler.requeue_delay(error, round_num - 1))
+            deferred = []
+            for job_data, job_row in pending:
+                try:
+                    scraped = scrape_job_browserless(client, dict(job_data), job_row, url)
+                except TransientError as e:
+                    print_progress(f"Requeueing job {job_data['Job Reference Number']}: {e}")
+                    metrics.inc("jobs_requeued_total")
+                    deferred.append((job_data, job_row))
+                    error = e
+                    continue
+                if scraped:
+                    save_to_json(scraped)
+                    print_progress(f"Saved: {scraped['Position'][:50]}...")
+                else:
+                    metrics.inc("browser_fallbacks_total")
+                    fallback_ids.add(job_row["id"])
+            pending = deferred
+            if not pending:
+                break
+        if pending:
+            metrics.inc("jobs_failed_total", len(pending))
+            # Keep the listing unvalidated so the next run fetches these jobs again
+            raise TransientError(f"{len(pending)} jobs on page {page_num} still failing after retries")
+
+        if seen_index is not None:
+            seen_index.remember_listing(url, response.headers)
+
+    return fallback_ids, new_jobs
+
 def scrape_page(url, page_num):
-    """Scrape a single page of jobs"""
+    """Scrape a single page of jobs, returning the number of jobs not seen before"""
     print_progress(f"Starting page {page_num}")
     
+    # Rows the browser has to handle; None means all of them
+    fallback_ids = None
+    if BROWSERLESS:
+        try:
+            fallback_ids, new_jobs = scrape_page_browserless(url, page_num)
+        except TransientError as e:
+            # The site is throttling or failing; Chrome would only add to the load
+            print_progress(f"Page {page_num} error: {e}")
+            forget_listing(url)
+            return None
+        except Exception as e:
+            print_progress(f"Page {page_num} browserless error, using Chrome: {e}")
+        if fallback_ids == set():
+            print_progress(f"Finished page {page_num}")
+            return new_jobs
+    
     try:
-        # Initialize browser
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.get(url)
-        
-        # Wait for jobs to load
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "tr[id^='tr']")))
-        
-        # Get all job elements
-        job_elements = driver.find_elements(By.CSS_SELECTOR, "tr[id^='tr']")
-        print_progress(f"Found {len(job_elements)} jobs on page {page_num}")
-        
-        # Process each job
-        for i, job_element in enumerate(job_elements, 1):
-            print_progress(f"Processing job {i}/{len(job_elements)} on page {page_num}")
-            job_data = scrape_job_page(driver, job_element)
-            if job_data:
-                save_to_json(job_data)
-                print_progress(f"Saved: {job_data['Position'][:50]}...")
+        # Lease a warm browser from the pool
+        with driver_pool.lease() as driver:
+            # Wait for jobs to load
+            load_listing(driver, url)
+            
+            # Get all job elements
+            if BATCHED_EXTRACTION:
+                main_handle = driver.current_window_handle
+                with metrics.timed("row_parse"):
+                    job_elements = extract_listing_rows(driver)
+                if fallback_ids is not None:
+                    job_elements = [row for row in job_elements if row["id"] in fallback_ids]
+            else:
+                job_elements = driver.find_elements(By.CSS_SELECTOR, "tr[id^='tr']")
+                if fallback_ids is not None:
+                    job_elements = [element for element in job_elements if element.get_attribute("id") in fallback_ids]
+            if fallback_ids is not None:
+                print_progress(f"Falling back to Chrome for {len(job_elements)} jobs on page {page_num}")
+            else:
+                print_progress(f"Found {len(job_elements)} jobs on page {page_num}")
+            
+            # Process each job; jobs whose requests keep failing go to the back of the queue
+            if fallback_ids is None:
+                new_jobs = 0
+            pending = job_elements
+            error = None
+            for round_num in range(REQUEUE_ROUNDS + 1):
+                if round_num:
+                    time.sleep(scheduler.requeue_delay(error, round_num - 1))
+                deferred = []
+                for i, job_element in enumerate(pending, 1):
+                    print_progress(f"Processing job {i}/{len(pending)} on page {page_num}")
+                    try:
+                        if BATCHED_EXTRACTION:
+                            job_data = scrape_job_row(driver, job_element, main_handle)
+                        else:
+                            job_data = scrape_job_page(driver, job_element)
+                    except TransientError as e:
+                        print_progress(f"Requeueing job {i} on page {page_num}: {e}")
+                        metrics.inc("jobs_requeued_total")
+                        deferred.append(job_element)
+                        error = e
+                        continue
+                    if job_data is not KNOWN_JOB and fallback_ids is None:
+                        new_jobs += 1
+                    if job_data:
+                        save_to_json(job_data)
+                        print_progress(f"Saved: {job_data['Position'][:50]}...")
+                    elif job_data is None:
+                        metrics.inc("jobs_failed_total")
+                        forget_listing(url)
+                pending = deferred
+                if not pending:
+                    break
+            if pending:
+                metrics.inc("jobs_failed_total", len(pending))
+                raise TransientError(f"{len(pending)} jobs on page {page_num} still failing after retries")
         
         print_progress(f"Finished page {page_num}")
+        return new_jobs
         
     except Exception as e:
         print_progress(f"Page {page_num} error: {e}")
-    finally:
-        if 'driver' in locals():
-            driver.quit()
+        forget_listing(url)
 
 def main():
     """Main scraping function"""
+    global store, ocr_cache, ocr_stage, seen_index, driver_pool
     print_progress("Starting scraping process")
+    store = open_store(STORAGE_BACKEND, store_file())
+    migrate_legacy_json(store, JSON_FILE)
+    if INCREMENTAL:
+        seen_index = SeenIndex(SEEN_INDEX_FILE)
+        seen_index.seed(store)
+    configure(OCR_PRESET, OCR_PREPROCESS)
+    if OCR_CACHE:
+        ocr_cache = OcrCache(OCR_CACHE_FILE, engine_fingerprint())
+    ocr_stage = OcrStage(OCR_WORKERS)
+    # Browsers are only started on first use when detail pages come over HTTP
+    driver_pool = DriverPool(browser_options(), size=PAGE_WORKERS, warm=not BROWSERLESS)
+    for stage in PROFILE_STAGES:
+        metrics.enable_profiling(stage)
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    scheduler.configure(rate=REQUEST_RATE)
     start_time = time.time()
-    
-    base_url = "https://www.topjobs.lk/applicant/vacancybyfunctionalarea.jsp?FA=AV&pageNo="
-    pages_to_scrape = 2  # Start with 2 pages for testing
+    failed_pages = []
     
     try:
-        for page_num in range(1, pages_to_scrape + 1):
-            scrape_page(f"{base_url}{page_num}", page_num)
+        with ThreadPoolExecutor(max_workers=PAGE_WORKERS) as executor:
+            for first_page in range(1, PAGES_TO_SCRAPE + 1, PAGE_WORKERS):
+                page_nums = range(first_page, min(first_page + PAGE_WORKERS, PAGES_TO_SCRAPE + 1))
+                results = list(executor.map(lambda page_num: scrape_page(f"{LISTING_URL}{page_num}", page_num), page_nums))
+                failed_pages.extend(page_num for page_num, result in zip(page_nums, results) if result is None)
+                if INCREMENTAL and 0 in results:
+                    print_progress(f"No new jobs on page {page_nums[results.index(0)]}, stopping")
+                    break
+            
+            # Pages that failed are retried once the rest are done, giving the site time to recover
+            for _ in range(REQUEUE_ROUNDS):
+                if not failed_pages:
+                    break
+                print_progress(f"Retrying pages {failed_pages}")
+                time.sleep(scheduler.reset_delay())
+                results = list(executor.map(lambda page_num: scrape_page(f"{LISTING_URL}{page_num}", page_num), failed_pages))
+                failed_pages = [page_num for page_num, result in zip(failed_pages, results) if result is None]
+            if failed_pages:
+                print_progress(f"Pages {failed_pages} failed, they will be retried on the next run")
         
+        wait_for_ocr()
+        if seen_index is not None:
+            seen_index.commit_listings()
         print_progress("Scraping completed successfully")
     except KeyboardInterrupt:
         print_progress("Scraping interrupted by user")
     except Exception as e:
         print_progress(f"Fatal error: {e}")
     finally:
+        driver_pool.close()
+        # Fill in the text of every partial record before the store closes
+        ocr_stage.shutdown()
+        store.close()
+        if EXPORT_JSON:
+            exported = store.export_json(JSON_FILE)
+            print_progress(f"Exported {exported} jobs to {JSON_FILE}")
+        if ocr_cache:
+            print_progress(f"OCR cache: {ocr_cache.stats()}")
+            ocr_cache.close()
+        if seen_index is not None:
+            print_progress(f"Skipped {seen_index.skipped} known jobs")
+            seen_index.close()
+        print_progress(f"Requests: {scheduler.stats()}")
+        metrics.write_prometheus(METRICS_FILE)
+        metrics.write_summary(SUMMARY_FILE)
+        metrics.dump_profiles()
+        metrics.close()
+        print_progress(f"Metrics written to {METRICS_FILE} and {SUMMARY_FILE}")
         duration = time.time() - start_time
         print_progress(f"Total execution time: {duration:.2f} seconds")
 
@@ -0,0 +1,234 @@
+"""Per-stage metrics for the scrapers.
+
+Every stage of a crawl (listing fetch, row parse, detail load, image
+download, OCR and save) is wrapped in ``metrics.timed(stage)``, which feeds a
+fixed-bucket latency histogram and counts failures by exception type.
+Recording is a perf_counter call, a bisect and a locked increment, so it is
+cheap enough to leave on in production.
+
+Metrics can be exported in the Prometheus text format, to a file or over a
+small HTTP endpoint, and as a JSON run summary. Individual stages can also be
+profiled with cProfile, or pyinstrument when it is installed.
+"""
+import bisect
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STAGES = ("listing_fetch", "row_parse", "detail_load", "image_download", "ocr", "save")
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_FILE = "metrics.prom"
+SUMMARY_FILE = "run_summary.json"
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction):
+        """Estimate a quantile by interpolating inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class _PyinstrumentProfiler:
+    """Adapter giving pyinstrument the enable/disable interface of cProfile"""
+
+    def __init__(self):
+        from pyinstrument import Profiler
+        self.profiler = Profiler()
+
+    def enable(self):
+        self.profiler.start()
+
+    def disable(self):
+        self.profiler.stop()
+
+    def dump_stats(self, path):
+        with open(path.replace(".prof", ".txt"), "w", encoding="utf-8") as file:
+            file.write(self.profiler.output_text())
+
+
+class Metrics:
+    """Thread-safe registry of stage histograms, error counts and counters"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.started = time.time()
+        self.histograms = {stage: Histogram(buckets) for stage in STAGES}
+        self.errors = defaultdict(int)
+        self.counters = defaultdict(int)
+        self._profilers = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def error(self, stage, exc):
+        with self._lock:
+            self.errors[(stage, type(exc).__name__)] += 1
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    @contextmanager
+    def timed(self, stage):
+        """Time a block as one call of a stage, counting any exception it raises"""
+        profiler = self._profilers.get(stage)
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except (RuntimeError, ValueError):
+                # Another profiler is already active on this thread
+                profiler = None
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.error(stage, e)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+            if profiler is not None:
+                profiler.disable()
+
+    def enable_profiling(self, stage, profiler="cprofile"):
+        """Profile every call of a stage with cProfile or pyinstrument"""
+        self._profilers[stage] = _PyinstrumentProfiler() if profiler == "pyinstrument" else cProfile.Profile()
+
+    def dump_profiles(self, directory="."):
+        for stage, profiler in self._profilers.items():
+            profiler.dump_stats(os.path.join(directory, f"profile_{stage}.prof"))
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP topjobs_stage_duration_seconds Time spent per call of each scraper stage.",
+            "# TYPE topjobs_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for stage, histogram in self.histograms.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'topjobs_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'topjobs_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'topjobs_stage_duration_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'topjobs_stage_duration_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            lines.append("# HELP topjobs_stage_errors_total Stage failures by exception type.")
+            lines.append("# TYPE topjobs_stage_errors_total counter")
+            for (stage, error_type), count in sorted(self.errors.items()):
+                lines.append(f'topjobs_stage_errors_total{{stage="{stage}",type="{error_type}"}} {count}')
+
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE topjobs_{name} counter")
+                lines.append(f"topjobs_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """JSON-serialisable summary of the run so far"""
+        elapsed = time.time() - self.started
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": histogram.count,
+                    "mean_ms": histogram.sum / histogram.count * 1000 if histogram.count else 0.0,
+                    "p50_ms": histogram.quantile(0.5) * 1000,
+                    "p99_ms": histogram.quantile(0.99) * 1000,
+                    "total_s": histogram.sum,
+                }
+                for stage, histogram in self.histograms.items()
+            }
+            errors = defaultdict(dict)
+            for (stage, error_type), count in self.errors.items():
+                errors[stage][error_type] = count
+            counters = dict(self.counters)
+        return {
+            "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+            "elapsed_s": elapsed,
+            "jobs_per_sec": counters.get("jobs_saved_total", 0) / elapsed if elapsed else 0.0,
+            "stages": stages,
+            "errors": dict(errors),
+            "counters": counters,
+        }
+
+    def write_prometheus(self, path=METRICS_FILE):
+        _write_atomic(path, self.render_prometheus())
+
+    def write_summary(self, path=SUMMARY_FILE):
+        _write_atomic(path, json.dumps(self.summary(), indent=4))
+
+    def serve(self, port, host="127.0.0.1"):
+        """Expose /metrics over HTTP from a background thread"""
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] == "/metrics":
+                    body, content_type = registry.render_prometheus().encode(), "text/plain; version=0.0.4"
+                elif self.path.split("?")[0] == "/summary":
+                    body, content_type = json.dumps(registry.summary()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(tmp_path, path)
+
+
+# Shared registry used by the scrapers
+metrics = Metrics()
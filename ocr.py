@@ -1,16 +1,21 @@
-import json
+import os
 import httpx
 import time
+from contextlib import ExitStack
 from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import pytesseract
-from PIL import Image
-from io import BytesIO
+from dom_extract import extract_detail
+from driver_pool import DriverPool
+from incremental import SEEN_INDEX_FILE, SeenIndex
+from ocr_cache import OCR_CACHE_FILE, OcrCache
+from ocr_worker import engine_fingerprint, image_to_text
+from scheduler import TransientError, scheduler
+from storage import migrate_legacy_json, open_store
+from topjobs import detail_url_for_row, fetch_job_details, find_job_rows, parse_listing_row
 
 # Path to the Tesseract executable (update this according to your installation)
 pytesseract.pytesseract.tesseract_cmd = r'/usr/bin/tesseract'
@@ -25,159 +30,216 @@ chrome_options.add_argument("start-maximized")
 chrome_options.add_argument("disable-infobars")
 chrome_options.add_argument("--disable-extensions")
 
+# Site to scrape; set TOPJOBS_BASE_URL to point at a local fixture server
+BASE_URL = os.environ.get("TOPJOBS_BASE_URL", "https://www.topjobs.lk")
+NUM_PAGES = 5  # Adjust as needed
+
 # Set User-Agent header
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
 }
 
-# JSON file for real-time updates
+# Append-only record store, exported to the legacy JSON file after each run
 JSON_FILE = "scraped_data.json"
+JSONL_FILE = "scraped_data.jsonl"
+SQLITE_FILE = "scraped_data.sqlite3"
+STORAGE_BACKEND = "jsonl"
+EXPORT_JSON = True
+store = None
 
+# Fetch detail pages over plain HTTP, falling back to Selenium per row
+BROWSERLESS = True
 
-def save_to_json(job_data):
-    """Appends job data to the JSON file in real time."""
-    try:
-        with open(JSON_FILE, "r", encoding="utf-8") as file:
-            data = json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        data = []
+# Reuse OCR results for identical images seen in earlier runs
+OCR_CACHE = True
+ocr_cache = None
 
-    data.append(job_data)
+# Skip jobs scraped in earlier runs and stop at the first page without new ones
+INCREMENTAL = True
+seen_index = None
 
-    with open(JSON_FILE, "w", encoding="utf-8") as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
+# Warm Chrome instances reused across pages instead of one launch per page
+DRIVER_POOL_SIZE = 1
+driver_pool = None
 
+
+def save_to_json(job_data):
+    """Appends job data to the record store in real time."""
+    store.append(job_data)
+    if seen_index is not None:
+        seen_index.add(job_data["Job Reference Number"], job_data["Closing Date"])
     print(f"Job saved: {job_data['Position']}")
 
 
-def extract_image_text(image_url):
+def extract_image_text(client, image_url):
     """Extracts text from an image using OCR."""
     try:
-        image_response = httpx.get(image_url)
-        image = Image.open(BytesIO(image_response.content))
-        extracted_text = pytesseract.image_to_string(image).replace("\n", " ")
-        return extracted_text.strip() if extracted_text else "N/A"
+        image_response = scheduler.request(client, "GET", image_url)
+        if ocr_cache is not None:
+            return ocr_cache.get_or_compute(image_response.content, image_to_text)
+        return image_to_text(image_response.content)
+    except TransientError:
+        # Retried later by scrape_page rather than saved as "N/A"
+        raise
     except Exception as e:
         print(f"Error extracting text from image: {e}")
         return "N/A"
 
 
-def scrape_page(url, page_number):
-    """Scrapes a single page for job listings."""
-    with httpx.Client() as client:
-        response = client.get(url, headers=HEADERS)
+def scrape_job_details_browser(client, driver, job):
+    """Opens a job row in Selenium and extracts the SEO tags and image text."""
+    # Click Job Element in Selenium and wait for the new tab to open
+    with scheduler.slot(driver.current_url):
+        job_element = driver.find_element(By.ID, job["id"])
+        job_element.click()
+        WebDriverWait(driver, 10).until(EC.number_of_windows_to_be(2))
 
-    if response.status_code != 200:
-        print(f"Failed to load page {page_number}: {response.status_code}")
-        return
+    # Switch to new tab
+    driver.switch_to.window(driver.window_handles[1])
 
-    soup = BeautifulSoup(response.content, "html.parser")
-    job_listings = soup.find_all("tr", id=lambda x: x and x.startswith("tr"))
+    try:
+        # Title, meta tags and image src in one round trip
+        details = extract_detail(driver)
+        seo_title = details["SEO Title"]
+        meta_data = details["Meta Tags"]
+
+        # Extract text from an image if present
+        extracted_text = "N/A"
+        if details["Image Source"]:
+            try:
+                extracted_text = extract_image_text(client, details["Image Source"])
+            except TransientError:
+                raise
+            except Exception:
+                pass
+    finally:
+        # Close job tab and switch back
+        driver.close()
+        driver.switch_to.window(driver.window_handles[0])
 
-    if not job_listings:
-        print(f"No job listings found on page {page_number}.")
-        return
+    return seo_title, meta_data, extracted_text
 
-    # Initialize Selenium WebDriver (Headless Mode)
-    service = Service()
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    driver.get(url)
 
-    for job in job_listings:
+def scrape_page(url, page_number):
+    """Scrapes a single page for job listings and returns the number of new jobs."""
+    with httpx.Client(headers=HEADERS, timeout=10, follow_redirects=True) as client:
         try:
-            job_ref_element = job.find("td", width="5%", align="center")
-            job_ref = job_ref_element.text.strip() if job_ref_element else "N/A"
-
-            position_element = job.find("span", id="hdnJC1")
-            position = position_element.text.strip() if position_element else "N/A"
-
-            if position == "N/A":
-                job_desc_element = job.find("td", width="28%")
-                job_desc_parts = [
-                    part.strip()
-                    for part in job_desc_element.stripped_strings
-                    if part != "DEFZZZ" and not part.startswith("000")
-                ]
-                for part in job_desc_parts:
-                    if part.lower() != "company name withheld":
-                        position = part
-                        break
-
-            employer_element = job.find("h1")
-            employer = employer_element.text.strip() if employer_element else "N/A"
-
-            opening_date_elements = job.find_all("td", nowrap=True)
-            if len(opening_date_elements) >= 2:
-                opening_date = opening_date_elements[1].text.strip()
-                closing_date = opening_date_elements[2].text.strip()
+            response = scheduler.request(client, "GET", url)
+        except TransientError as e:
+            print(f"Failed to load page {page_number}: {e}")
+            return
+
+        if response.status_code != 200:
+            print(f"Failed to load page {page_number}: {response.status_code}")
+            return
+
+        soup = BeautifulSoup(response.content, "html.parser")
+        job_listings = find_job_rows(soup)
+
+        if not job_listings:
+            print(f"No job listings found on page {page_number}.")
+            return
+
+        # A pooled Selenium WebDriver (Headless Mode) is only leased for
+        # rows whose detail page cannot be fetched over plain HTTP
+        browser = ExitStack()
+        driver = None
+        new_jobs = 0
+
+        def scrape_job(job, job_data):
+            nonlocal driver
+            details = None
+            if BROWSERLESS:
+                detail_url = detail_url_for_row(job, url)
+                if detail_url:
+                    details = fetch_job_details(client, detail_url)
+
+            if details:
+                seo_title = details["SEO Title"]
+                meta_data = details["Meta Tags"]
+                image_src = details["Image Source"]
+                extracted_text = extract_image_text(client, image_src) if image_src else "N/A"
             else:
-                opening_date = "N/A"
-                closing_date = "N/A"
-
-            # Click Job Element in Selenium
-            job_element = driver.find_element(By.ID, job["id"])
-            job_element.click()
-
-            # Wait for the new tab to open
-            WebDriverWait(driver, 10).until(EC.number_of_windows_to_be(2))
-
-            # Switch to new tab
-            driver.switch_to.window(driver.window_handles[1])
-
-            # Extract SEO tags
-            seo_title = driver.title
-            meta_tags = driver.find_elements(By.CSS_SELECTOR, "meta")
-            meta_data = {
-                tag.get_attribute("name"): tag.get_attribute("content")
-                for tag in meta_tags
-                if tag.get_attribute("name")
-            }
-
-            # Extract text from an image if present
-            try:
-                image_element = driver.find_element(By.CSS_SELECTOR, "#remark img")
-                image_src = image_element.get_attribute("src")
-                extracted_text = extract_image_text(image_src)
-            except Exception:
-                extracted_text = "N/A"
-
-            # Close job tab and switch back
-            driver.close()
-            driver.switch_to.window(driver.window_handles[0])
+                if driver is None:
+                    driver = browser.enter_context(driver_pool.lease())
+                    with scheduler.slot(url):
+                        driver.get(url)
+                seo_title, meta_data, extracted_text = scrape_job_details_browser(client, driver, job)
 
             # Prepare job data
-            job_data = {
-                "Job Reference Number": job_ref,
-                "Position": position,
-                "Employer": employer,
-                "Opening Date": opening_date,
-                "Closing Date": closing_date,
+            job_data.update({
                 "SEO Title": seo_title,
                 "Meta Tags": meta_data,
                 "Extracted Text": extracted_text,
-            }
+            })
 
             # Save job data in real time
             save_to_json(job_data)
 
-        except Exception as e:
-            print(f"Error extracting job details: {e}")
+        # Jobs whose requests keep failing get one more try after the rest of the page
+        deferred = []
+        for job in job_listings:
+            try:
+                job_data = parse_listing_row(job)
+                if seen_index is not None and seen_index.is_known(
+                        job_data["Job Reference Number"], job_data["Closing Date"]):
+                    continue
+                new_jobs += 1
+                scrape_job(job, job_data)
+            except TransientError as e:
+                print(f"Retrying job later: {e}")
+                deferred.append((job, job_data))
+            except Exception as e:
+                print(f"Error extracting job details: {e}")
+
+        for job, job_data in deferred:
+            try:
+                scrape_job(job, job_data)
+            except Exception as e:
+                print(f"Error extracting job details: {e}")
 
-    # Close the browser
-    driver.quit()
+        # Return the browser to the pool
+        browser.close()
+
+    return new_jobs
 
 
 def scrape_all_pages():
     """Scrapes multiple pages and updates the JSON file in real time."""
-    base_url = "https://www.topjobs.lk/applicant/vacancybyfunctionalarea.jsp?FA=AV&pageNo="
-    num_pages = 5  # Adjust as needed
+    global store, ocr_cache, seen_index, driver_pool
+    store = open_store(STORAGE_BACKEND, SQLITE_FILE if STORAGE_BACKEND == "sqlite" else JSONL_FILE)
+    migrate_legacy_json(store, JSON_FILE)
+    if OCR_CACHE:
+        ocr_cache = OcrCache(OCR_CACHE_FILE, engine_fingerprint())
+    if INCREMENTAL:
+        seen_index = SeenIndex(SEEN_INDEX_FILE)
+        seen_index.seed(store)
+    driver_pool = DriverPool(chrome_options, size=DRIVER_POOL_SIZE, warm=not BROWSERLESS)
+    base_url = f"{BASE_URL}/applicant/vacancybyfunctionalarea.jsp?FA=AV&pageNo="
+    num_pages = NUM_PAGES
 
-    for page in range(1, num_pages + 1):
-        print(f"\nScraping page {page}...\n")
-        scrape_page(f"{base_url}{page}", page)
+    try:
+        for page in range(1, num_pages + 1):
+            print(f"\nScraping page {page}...\n")
+            new_jobs = scrape_page(f"{base_url}{page}", page)
+            if INCREMENTAL and new_jobs == 0:
+                print(f"No new jobs on page {page}, stopping.")
+                break
+    finally:
+        driver_pool.close()
+        store.close()
+        if EXPORT_JSON:
+            store.export_json(JSON_FILE)
+        print(f"Requests: {scheduler.stats()}")
+        if ocr_cache is not None:
+            print(f"OCR cache: {ocr_cache.stats()}")
+            ocr_cache.close()
+        if seen_index is not None:
+            seen_index.close()
 
     print("\nScraping completed. Data saved in real-time to 'scraped_data.json'.")
 
 
 # Start the scraping process
-scrape_all_pages()
+if __name__ == "__main__":
+    scrape_all_pages()
@@ -0,0 +1,162 @@
+"""Persistent, content-addressed cache of OCR results.
+
+Results are keyed by the SHA-256 of the image bytes together with an engine
+fingerprint (Tesseract version and config), so changing either never reuses
+stale text. Image URLs are also remembered with their ETag: a conditional
+request that comes back 304 Not Modified resolves to the cached text without
+downloading the image again.
+
+The cache lives in a single SQLite file and is kept under a byte budget by
+evicting the least recently used results.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+
+OCR_CACHE_FILE = "ocr_cache.sqlite3"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+ENTRY_OVERHEAD = 128  # approximate bytes per row on top of the text itself
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_results (
+    digest TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (digest, engine)
+);
+CREATE INDEX IF NOT EXISTS ocr_results_last_used ON ocr_results (last_used);
+CREATE TABLE IF NOT EXISTS image_urls (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    digest TEXT NOT NULL
+);
+"""
+
+
+def image_digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+class OcrCache:
+    """SQLite-backed OCR result cache with LRU eviction under a byte budget"""
+
+    def __init__(self, path=OCR_CACHE_FILE, engine="", max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.url_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self.total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+
+    def _lookup(self, digest):
+        row = self._db.execute(
+            "SELECT text FROM ocr_results WHERE digest = ? AND engine = ?", (digest, self.engine)
+        ).fetchone()
+        if row is None:
+            return None
+        self._db.execute(
+            "UPDATE ocr_results SET last_used = ? WHERE digest = ? AND engine = ?",
+            (time.time(), digest, self.engine),
+        )
+        self._db.commit()
+        return row[0]
+
+    def get(self, content):
+        """Return cached text for image bytes, or None"""
+        with self._lock:
+            text = self._lookup(image_digest(content))
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return text
+
+    def put(self, content, text, url=None, etag=None):
+        """Store the text of an image, and remember its URL and ETag if given"""
+        digest = image_digest(content)
+        size = len(text.encode("utf-8")) + ENTRY_OVERHEAD
+        with self._lock:
+            previous = self._db.execute(
+                "SELECT size FROM ocr_results WHERE digest = ? AND engine = ?", (digest, self.engine)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO ocr_results (digest, engine, text, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (digest, self.engine, text, size, time.time()),
+            )
+            self.total_bytes += size - (previous[0] if previous else 0)
+            if url and etag:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO image_urls (url, etag, digest) VALUES (?, ?, ?)", (url, etag, digest)
+                )
+            self._evict()
+            self._db.commit()
+
+    def get_or_compute(self, content, extract):
+        """Return cached text for image bytes, running extract(content) and caching it on a miss"""
+        text = self.get(content)
+        if text is None:
+            text = extract(content)
+            self.put(content, text)
+        return text
+
+    def etag_for(self, url):
+        """Return the ETag to revalidate a URL with, if its OCR result is still cached"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT u.etag FROM image_urls u JOIN ocr_results r ON r.digest = u.digest AND r.engine = ? "
+                "WHERE u.url = ?",
+                (self.engine, url),
+            ).fetchone()
+            return row[0] if row else None
+
+    def get_by_url(self, url):
+        """Return cached text for a URL the server reported as not modified, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT digest FROM image_urls WHERE url = ?", (url,)).fetchone()
+            text = self._lookup(row[0]) if row else None
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.url_hits += 1
+            return text
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT digest, engine, size FROM ocr_results ORDER BY last_used LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            for digest, engine, size in rows:
+                self._db.execute("DELETE FROM ocr_results WHERE digest = ? AND engine = ?", (digest, engine))
+                self.total_bytes -= size
+                self.evictions += 1
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "url_hits": self.url_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "bytes": self.total_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,255 @@
+"""OCR stage backed by a process pool.
+
+Tesseract is CPU-bound, so running it inline blocks the browser and network
+work and keeps it on a single core. OcrStage runs image_to_text in a
+ProcessPoolExecutor with a configurable number of workers; each worker
+limits Tesseract to one thread so throughput scales with the worker count
+instead of every process competing for all cores.
+
+Images can optionally be preprocessed before OCR (grayscale, downscaled to
+at most TARGET_DPI, binarised with Otsu's threshold and cropped to their
+text), and Tesseract can be run with one of the PRESETS page segmentation /
+engine modes. With a batch size above one, OcrStage collects images and
+runs a single Tesseract process over each batch, paying the process start
+and model load once per batch instead of once per image.
+"""
+import asyncio
+import os
+import shlex
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import pytesseract
+from PIL import Image, ImageOps
+
+TESSERACT_CMD = r'/usr/bin/tesseract'
+pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+PRESETS = {
+    "default": "",  # Tesseract's own defaults: automatic page segmentation, best available engine
+    "block": "--oem 1 --psm 6",  # LSTM only, one uniform block of text; suits most ads
+    "column": "--oem 1 --psm 4",  # LSTM only, a single column of text of variable sizes
+    "sparse": "--oem 1 --psm 11",  # LSTM only, scattered text in no particular order
+}
+OCR_CONFIG = PRESETS["default"]
+PREPROCESS = False  # Grayscale, downscale, binarise and crop images before OCR
+TARGET_DPI = 300
+MAX_DIMENSION = 2500  # Longest side in pixels after downscaling
+CROP_PADDING = 10  # Blank pixels kept around the cropped text
+BATCH_DELAY = 0.05  # Seconds a partial batch waits for more images
+
+
+def configure(preset=None, preprocess=None):
+    """Select a Tesseract preset and switch preprocessing on or off for this process"""
+    global OCR_CONFIG, PREPROCESS
+    if preset is not None:
+        try:
+            OCR_CONFIG = PRESETS[preset]
+        except KeyError:
+            raise ValueError(f"Unknown OCR preset: {preset}") from None
+    if preprocess is not None:
+        PREPROCESS = preprocess
+
+
+def _otsu_threshold(histogram):
+    """Grey level that best separates a histogram into two classes"""
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background_weight = background_sum = 0
+    best_variance, threshold = -1.0, 127
+    for level, count in enumerate(histogram):
+        background_weight += count
+        foreground_weight = total - background_weight
+        if not background_weight:
+            continue
+        if not foreground_weight:
+            break
+        background_sum += level * count
+        background_mean = background_sum / background_weight
+        foreground_mean = (weighted_total - background_sum) / foreground_weight
+        variance = background_weight * foreground_weight * (background_mean - foreground_mean) ** 2
+        if variance > best_variance:
+            best_variance, threshold = variance, level
+    return threshold
+
+
+def preprocess(image):
+    """Grayscale, downscale, binarise and margin-crop an image for OCR"""
+    dpi = image.info.get("dpi", (0, 0))[0]
+    image = ImageOps.exif_transpose(image).convert("L")
+
+    scale = TARGET_DPI / dpi if dpi and dpi > TARGET_DPI else 1.0
+    scale = min(scale, MAX_DIMENSION / max(image.size))
+    if scale < 1.0:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+
+    threshold = _otsu_threshold(image.histogram())
+    image = image.point([0 if level <= threshold else 255 for level in range(256)])
+
+    # Tesseract expects dark text on a light background
+    corners = [image.getpixel(corner) for corner in
+               ((0, 0), (image.width - 1, 0), (0, image.height - 1), (image.width - 1, image.height - 1))]
+    if sum(1 for corner in corners if corner == 0) > 2:
+        image = ImageOps.invert(image)
+
+    bbox = ImageOps.invert(image).getbbox()
+    if bbox:
+        left, top, right, bottom = bbox
+        image = image.crop((max(0, left - CROP_PADDING), max(0, top - CROP_PADDING),
+                            min(image.width, right + CROP_PADDING), min(image.height, bottom + CROP_PADDING)))
+
+    if dpi:
+        effective_dpi = round(dpi * scale)
+        image.info["dpi"] = (effective_dpi, effective_dpi)
+    return image
+
+
+def _clean(text):
+    text = text.replace("\n", " ").strip()
+    return text if text else "N/A"
+
+
+def _load(content):
+    image = Image.open(BytesIO(content))
+    return preprocess(image) if PREPROCESS else image
+
+
+def image_to_text(content):
+    """Run OCR over downloaded image bytes"""
+    image = _load(content)
+    return _clean(pytesseract.image_to_string(image, config=OCR_CONFIG))
+
+
+def images_to_text(contents):
+    """Run OCR over a list of images with a single Tesseract process"""
+    if len(contents) == 1:
+        return [image_to_text(contents[0])]
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for index, content in enumerate(contents):
+            image = _load(content)
+            if image.mode not in ("1", "L", "P", "RGB", "RGBA"):
+                image = image.convert("RGB")
+            path = os.path.join(directory, f"{index}.png")
+            options = {"dpi": image.info["dpi"]} if "dpi" in image.info else {}
+            image.save(path, **options)
+            paths.append(path)
+        list_path = os.path.join(directory, "images.txt")
+        with open(list_path, "w", encoding="utf-8") as file:
+            file.write("\n".join(paths) + "\n")
+
+        completed = subprocess.run(
+            [TESSERACT_CMD, list_path, "stdout", *shlex.split(OCR_CONFIG)],
+            capture_output=True, check=True,
+        )
+    # Tesseract ends every page with a form feed
+    pages = completed.stdout.decode("utf-8", errors="replace").split("\f")
+    if len(pages) == len(contents) + 1 and not pages[-1].strip():
+        pages.pop()
+    if len(pages) != len(contents):
+        # Fall back to one process per image rather than misattribute text
+        return [image_to_text(content) for content in contents]
+    return [_clean(page) for page in pages]
+
+
+def engine_fingerprint():
+    """Identify the Tesseract version and config, for keying cached OCR results"""
+    try:
+        version = pytesseract.get_tesseract_version()
+    except Exception:
+        version = "unknown"
+    fingerprint = f"tesseract {version} config={OCR_CONFIG!r}"
+    if PREPROCESS:
+        fingerprint += f" preprocess=dpi{TARGET_DPI},max{MAX_DIMENSION},otsu,crop{CROP_PADDING}"
+    return fingerprint
+
+
+def _image_to_text_in_worker(content):
+    try:
+        return image_to_text(content)
+    except Exception as e:
+        # Some pytesseract exceptions cannot be unpickled and would break the pool
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+
+def _images_to_text_in_worker(contents):
+    try:
+        return images_to_text(contents)
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+
+def _init_worker(config, preprocess_images):
+    global OCR_CONFIG, PREPROCESS
+    # One OpenMP thread per Tesseract process; parallelism comes from the pool
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    OCR_CONFIG, PREPROCESS = config, preprocess_images
+
+
+class OcrStage:
+    """Process pool that runs OCR off the scraping threads"""
+
+    def __init__(self, workers=None, batch_size=1):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(OCR_CONFIG, PREPROCESS))
+        self._batch = []
+        self._flush_handle = None
+
+    def submit(self, content):
+        """Queue image bytes for OCR and return a concurrent.futures.Future"""
+        return self.executor.submit(_image_to_text_in_worker, content)
+
+    def submit_batch(self, contents):
+        """Queue a list of images for one Tesseract run; the Future resolves to a list of texts"""
+        return self.executor.submit(_images_to_text_in_worker, contents)
+
+    async def extract(self, content):
+        """Await OCR of image bytes from an asyncio task"""
+        if self.batch_size <= 1:
+            return await asyncio.wrap_future(self.submit(content))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch.append((content, future))
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(BATCH_DELAY, self._flush)
+        return await future
+
+    def _flush(self):
+        """Send the images collected so far to the pool as one batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+
+        def distribute(batch_future):
+            if batch_future.cancelled():
+                for _, future in batch:
+                    future.cancel()
+            elif batch_future.exception() is not None:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(batch_future.exception())
+            else:
+                for (_, future), text in zip(batch, batch_future.result()):
+                    if not future.done():
+                        future.set_result(text)
+
+        asyncio.wrap_future(self.submit_batch([content for content, _ in batch])).add_done_callback(distribute)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
@@ -0,0 +1,489 @@
+"""Asynchronous crawl pipeline.
+
+Listing pages, detail pages and ad images are handled by separate pools of
+workers connected by bounded queues, and every request goes through one
+shared keep-alive httpx.AsyncClient. Each stage's concurrency is set on its
+own, so the number of requests in flight can be raised until the site's
+rate limit is reached instead of being capped at one.
+
+OCR runs in its own stage on a process pool: image workers save the job as a
+partial record, hand the image bytes over and move on, and the extracted
+text is written to the store as an update once Tesseract finishes. Only
+then does the job join the seen index, so a run interrupted before OCR
+finished scrapes it again.
+
+Rows whose detail page cannot be fetched over plain HTTP are handed to
+Selenium workers on their own threads, which lease Chrome instances from a
+DriverPool.
+
+With --incremental, jobs already in the seen index are skipped before any
+detail or OCR work, listing pages are requested conditionally, and no pages
+past the first one without new jobs are fetched.
+
+Every request goes through the shared scheduler (see scheduler.py), which
+limits the rate and concurrency per host, backs off and retries throttled or
+failed requests and opens a circuit breaker when the site keeps failing.
+Items whose requests still fail are put back on their queue after a delay,
+up to DEFAULT_REQUEUES times, rather than being saved without their text.
+
+Every stage is timed into the shared metrics registry; the Prometheus text
+and a JSON run summary are written at the end of the run, and can be served
+live with --metrics-port.
+
+Usage:
+    python3 pipeline.py --pages 5 --detail-concurrency 8 --image-concurrency 8 --ocr-workers 16
+    python3 pipeline.py --incremental --pages 50
+    python3 pipeline.py --metrics-port 9108 --profile-stage row_parse
+    python3 pipeline.py --ocr-preprocess --ocr-preset block --ocr-batch 8
+    python3 pipeline.py --rate 5 --max-concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from bs4 import BeautifulSoup
+
+from main import (BASE_URL, EXPORT_JSON, HEADERS, JSON_FILE, JSONL_FILE, LISTING_PATH, LISTING_URL,
+                  SQLITE_FILE, STORAGE_BACKEND, browser_options, load_listing, open_job_row,
+                  print_progress)
+from dom_extract import extract_listing_rows
+from driver_pool import DriverPool
+from incremental import SEEN_INDEX_FILE, SeenIndex
+from metrics import METRICS_FILE, STAGES, SUMMARY_FILE, metrics
+from ocr_cache import DEFAULT_MAX_BYTES, OCR_CACHE_FILE, OcrCache
+from ocr_worker import PRESETS, OcrStage, configure, engine_fingerprint
+from scheduler import DEFAULT_RATE, MAX_CONCURRENCY, CircuitOpenError, TransientError, scheduler
+from storage import BACKENDS, migrate_legacy_json, open_store
+from topjobs import detail_url_for_row, find_job_rows, parse_detail_page, parse_listing_row
+
+DEFAULT_PAGES = 2
+DEFAULT_LISTING_CONCURRENCY = 2
+DEFAULT_DETAIL_CONCURRENCY = 8
+DEFAULT_IMAGE_CONCURRENCY = 8
+DEFAULT_OCR_WORKERS = os.cpu_count() or 1
+DEFAULT_BROWSER_WORKERS = 1
+DEFAULT_QUEUE_SIZE = 100
+REQUEST_TIMEOUT = 10
+DEFAULT_REQUEUES = 2  # Times an item is put back on its queue after its requests kept failing
+
+
+class BrowserFallback:
+    """Scrape rows that need a real browser with drivers leased from a pool"""
+
+    def __init__(self, size=DEFAULT_BROWSER_WORKERS):
+        # Chrome is only started once a row actually needs it
+        self.pool = DriverPool(browser_options(), size=size, warm=False)
+
+    def scrape(self, page_url, row_id):
+        """Return (job data, image URL, image bytes or None) for a row, or None if it is not on the page"""
+        with self.pool.lease() as driver:
+            if driver.current_url != page_url:
+                load_listing(driver, page_url)
+            for row in extract_listing_rows(driver):
+                if row["id"] == row_id:
+                    return open_job_row(driver, row, driver.current_window_handle)
+            return None
+
+    def close(self):
+        self.pool.close()
+
+
+class CrawlPipeline:
+    """Listing, detail, image and OCR stages connected by bounded queues"""
+
+    def __init__(self, store, listing_url=LISTING_URL,
+                 listing_concurrency=DEFAULT_LISTING_CONCURRENCY,
+                 detail_concurrency=DEFAULT_DETAIL_CONCURRENCY,
+                 image_concurrency=DEFAULT_IMAGE_CONCURRENCY,
+                 ocr_workers=DEFAULT_OCR_WORKERS,
+                 browser_workers=DEFAULT_BROWSER_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE, ocr_cache=None, seen_index=None,
+                 ocr_batch_size=1, requeues=DEFAULT_REQUEUES):
+        self.store = store
+        self.listing_url = listing_url
+        self.listing_concurrency = listing_concurrency
+        self.detail_concurrency = detail_concurrency
+        self.image_concurrency = image_concurrency
+        self.ocr_workers = ocr_workers
+        self.ocr_batch_size = ocr_batch_size
+        self.browser_workers = browser_workers
+        self.queue_size = queue_size
+        self.client = None
+        self.saved = 0
+        self.browser = BrowserFallback(browser_workers)
+        self.browser_executor = ThreadPoolExecutor(max_workers=browser_workers)
+        self.ocr_stage = None
+        self.ocr_cache = ocr_cache
+        self.seen_index = seen_index
+        self.stop_page = None
+        self.requeues = requeues
+        self._requeued = {}
+        self._retry_tasks = set()
+
+    async def run(self, page_numbers):
+        """Crawl the given listing pages and wait for every stage to drain"""
+        self.page_queue = asyncio.Queue()
+        self.detail_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.image_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.ocr_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.browser_queue = asyncio.Queue()
+
+        connections = self.listing_concurrency + self.detail_concurrency + self.image_concurrency
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+
+        async with httpx.AsyncClient(headers=HEADERS, timeout=REQUEST_TIMEOUT, limits=limits,
+                                     follow_redirects=True) as client:
+            self.client = client
+            self.ocr_stage = OcrStage(self.ocr_workers, self.ocr_batch_size)
+            workers = (
+                self._spawn(self.page_queue, self.fetch_listing, self.listing_concurrency)
+                + self._spawn(self.detail_queue, self.fetch_detail, self.detail_concurrency)
+                + self._spawn(self.image_queue, self.fetch_image, self.image_concurrency)
+                # Enough OCR tasks waiting to fill a batch for every process
+                + self._spawn(self.ocr_queue, self.run_ocr, self.ocr_workers * self.ocr_batch_size)
+                + self._spawn(self.browser_queue, self.scrape_in_browser, self.browser_workers)
+            )
+            for page_num in page_numbers:
+                self.page_queue.put_nowait(page_num)
+
+            try:
+                # Upstream stages only mark an item done after handing it on;
+                # requeued items wait outside the queues, so drain again after them
+                while True:
+                    for queue in (self.page_queue, self.detail_queue, self.browser_queue,
+                                  self.image_queue, self.ocr_queue):
+                        await queue.join()
+                    if not self._retry_tasks:
+                        break
+                    await asyncio.gather(*self._retry_tasks)
+                if self.seen_index is not None:
+                    self.seen_index.commit_listings()
+            finally:
+                for task in (*workers, *self._retry_tasks):
+                    task.cancel()
+                await asyncio.gather(*workers, *self._retry_tasks, return_exceptions=True)
+                self.ocr_stage.shutdown()
+                await asyncio.get_running_loop().run_in_executor(self.browser_executor, self.browser.close)
+                self.browser_executor.shutdown()
+
+    def _spawn(self, queue, handler, concurrency):
+        return [asyncio.ensure_future(self._worker(queue, handler)) for _ in range(concurrency)]
+
+    async def _worker(self, queue, handler):
+        while True:
+            item = await queue.get()
+            try:
+                await handler(item)
+                self._requeued.pop(id(item), None)
+            except TransientError as e:
+                self._requeue(queue, item, handler, e)
+            except Exception as e:
+                self._requeued.pop(id(item), None)
+                metrics.error(handler.__name__, e)
+                print_progress(f"{handler.__name__} error: {e}")
+                self._failed(handler, item)
+            finally:
+                queue.task_done()
+
+    def _requeue(self, queue, item, handler, error):
+        """Put an item back on its queue after a delay, or give up on it"""
+        attempt = self._requeued.get(id(item), 0)
+        if attempt >= self.requeues:
+            self._requeued.pop(id(item), None)
+            metrics.error(handler.__name__, error)
+            print_progress(f"{handler.__name__} gave up: {error}")
+            self._failed(handler, item)
+            return
+        # Waiting for a half-open circuit's trial request is not an attempt
+        if not (isinstance(error, CircuitOpenError) and error.half_open):
+            self._requeued[id(item)] = attempt + 1
+        metrics.inc("jobs_requeued_total")
+        delay = scheduler.requeue_delay(error, attempt)
+        print_progress(f"{handler.__name__} requeued in {delay:.1f}s: {error}")
+
+        async def put_back():
+            await asyncio.sleep(delay)
+            await queue.put(item)
+
+        task = asyncio.ensure_future(put_back())
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    def _failed(self, handler, item):
+        """Count a job as failed and have its listing page fetched in full next run"""
+        if handler == self.fetch_listing:
+            page_url = f"{self.listing_url}{item}"
+        else:
+            # Items of the job stages start with the listing page they came from
+            page_url = item[0]
+            metrics.inc("jobs_failed_total")
+        if self.seen_index is not None:
+            self.seen_index.forget_listing(page_url)
+
+    def save(self, job_data):
+        try:
+            with metrics.timed("save"):
+                self.store.append(job_data)
+                # Partial records join the index once their OCR text is stored
+                if self.seen_index is not None and job_data["Extracted Text"] is not None:
+                    self.seen_index.add(job_data["Job Reference Number"], job_data["Closing Date"])
+            self.saved += 1
+            metrics.inc("jobs_saved_total")
+            print_progress(f"Saved: {job_data['Position'][:50]}...")
+        except Exception as e:
+            print_progress(f"Error saving job: {e}")
+
+    async def fetch_listing(self, page_num):
+        """Fetch a listing page and queue its new rows for detail fetching"""
+        if self.stop_page is not None and page_num > self.stop_page:
+            return
+        url = f"{self.listing_url}{page_num}"
+        print_progress(f"Starting page {page_num}")
+        headers = self.seen_index.listing_headers(url) if self.seen_index is not None else None
+        with metrics.timed("listing_fetch"):
+            response = await scheduler.arequest(self.client, "GET", url, headers=headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+        if response.status_code == 304:
+            print_progress(f"Page {page_num} not modified")
+            metrics.inc("listings_not_modified_total")
+            self._stop_at(page_num)
+            return
+
+        with metrics.timed("row_parse"):
+            job_rows = find_job_rows(BeautifulSoup(response.content, "html.parser"))
+        print_progress(f"Found {len(job_rows)} jobs on page {page_num}")
+
+        new_jobs = 0
+        for job_row in job_rows:
+            with metrics.timed("row_parse"):
+                job_data = parse_listing_row(job_row)
+            if self.seen_index is not None and self.seen_index.is_known(job_data["Job Reference Number"],
+                                                                        job_data["Closing Date"]):
+                metrics.inc("jobs_skipped_total")
+                continue
+            new_jobs += 1
+            detail_url = detail_url_for_row(job_row, url)
+            if detail_url:
+                await self.detail_queue.put((url, job_data, detail_url, job_row["id"]))
+            else:
+                await self.browser_queue.put((url, job_row["id"]))
+
+        if self.seen_index is not None:
+            self.seen_index.remember_listing(url, response.headers)
+            if new_jobs == 0:
+                print_progress(f"No new jobs on page {page_num}")
+                self._stop_at(page_num)
+
+    def _stop_at(self, page_num):
+        """Stop paginating after the given page"""
+        if self.stop_page is None or page_num < self.stop_page:
+            self.stop_page = page_num
+
+    async def fetch_detail(self, item):
+        """Fetch a detail page and queue its ad image for OCR"""
+        page_url, job_data, detail_url, row_id = item
+        details = None
+        try:
+            with metrics.timed("detail_load"):
+                response = await scheduler.arequest(self.client, "GET", detail_url)
+                if response.status_code == 200:
+                    details = parse_detail_page(response.text, str(response.url))
+        except httpx.HTTPError as e:
+            print_progress(f"Detail fetch error: {e}")
+
+        if details is None:
+            metrics.inc("browser_fallbacks_total")
+            await self.browser_queue.put((page_url, row_id))
+            return
+
+        job_data["SEO Title"] = details["SEO Title"]
+        job_data["Meta Tags"] = details["Meta Tags"]
+        if details["Image Source"]:
+            await self.image_queue.put((page_url, job_data, details["Image Source"]))
+        else:
+            job_data["Extracted Text"] = "N/A"
+            self.save(job_data)
+
+    async def fetch_image(self, item):
+        """Download an ad image, save the job as a partial record and hand the image to OCR"""
+        page_url, job_data, image_src = item
+        try:
+            with metrics.timed("image_download"):
+                etag = self.ocr_cache.etag_for(image_src) if self.ocr_cache else None
+                headers = {"If-None-Match": etag} if etag else None
+                response = await scheduler.arequest(self.client, "GET", image_src, headers=headers)
+                extracted_text = None
+                if response.status_code == 304:
+                    extracted_text = self.ocr_cache.get_by_url(image_src)
+                    if extracted_text is None:
+                        response = await scheduler.arequest(self.client, "GET", image_src)
+                if extracted_text is None:
+                    response.raise_for_status()
+            if extracted_text is not None:
+                metrics.inc("ocr_cache_hits_total")
+                job_data["Extracted Text"] = extracted_text
+                self.save(job_data)
+                return
+        except TransientError:
+            raise
+        except Exception as e:
+            print_progress(f"OCR Error: {e}")
+            job_data["Extracted Text"] = "N/A"
+            self.save(job_data)
+            return
+
+        await self.queue_ocr(page_url, job_data, response.content, image_src, response.headers.get("ETag"))
+
+    async def queue_ocr(self, page_url, job_data, content, image_src, etag=None):
+        """Save a job whose image is downloaded, as a partial record unless its text is cached"""
+        extracted_text = self.ocr_cache.get(content) if self.ocr_cache else None
+        if extracted_text is not None:
+            metrics.inc("ocr_cache_hits_total")
+            job_data["Extracted Text"] = extracted_text
+            self.save(job_data)
+            return
+
+        job_data["Extracted Text"] = None
+        self.save(job_data)
+        await self.ocr_queue.put((page_url, job_data, content, image_src, etag))
+
+    async def run_ocr(self, item):
+        """Extract the text of an ad image and fill it into the saved record"""
+        _, job_data, content, image_src, etag = item
+        try:
+            with metrics.timed("ocr"):
+                extracted_text = await self.ocr_stage.extract(content)
+        except Exception as e:
+            print_progress(f"OCR Error: {e}")
+            extracted_text = "N/A"
+        else:
+            if self.ocr_cache:
+                self.ocr_cache.put(content, extracted_text, image_src, etag)
+        with metrics.timed("save"):
+            self.store.update(job_data["Job Reference Number"], {"Extracted Text": extracted_text})
+            if self.seen_index is not None:
+                self.seen_index.add(job_data["Job Reference Number"], job_data["Closing Date"])
+
+    async def scrape_in_browser(self, item):
+        """Scrape a row with Selenium when plain HTTP was not enough and hand its image to OCR"""
+        page_url, row_id = item
+        loop = asyncio.get_running_loop()
+        scraped = await loop.run_in_executor(self.browser_executor, self.browser.scrape, page_url, row_id)
+        if scraped is None:
+            self._failed(self.scrape_in_browser, item)
+            return
+
+        job_data, image_src, content = scraped
+        if not image_src:
+            job_data["Extracted Text"] = "N/A"
+            self.save(job_data)
+        elif content is None:
+            # The browser did not keep the image, so download it like the HTTP path does
+            await self.image_queue.put((page_url, job_data, image_src))
+        else:
+            await self.queue_ocr(page_url, job_data, content, image_src)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Asynchronous TopJobs crawler")
+    parser.add_argument("--pages", type=int, default=DEFAULT_PAGES)
+    parser.add_argument("--base-url", default=BASE_URL, help="site to crawl, e.g. a local fixture server")
+    parser.add_argument("--listing-concurrency", type=int, default=DEFAULT_LISTING_CONCURRENCY)
+    parser.add_argument("--detail-concurrency", type=int, default=DEFAULT_DETAIL_CONCURRENCY)
+    parser.add_argument("--image-concurrency", type=int, default=DEFAULT_IMAGE_CONCURRENCY)
+    parser.add_argument("--ocr-workers", type=int, default=DEFAULT_OCR_WORKERS)
+    parser.add_argument("--browser-workers", type=int, default=DEFAULT_BROWSER_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="requests per second per host")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY,
+                        help="upper bound of the adaptive in-flight limit per host")
+    parser.add_argument("--requeues", type=int, default=DEFAULT_REQUEUES,
+                        help="times an item is retried after its requests kept failing")
+    parser.add_argument("--storage", choices=sorted(BACKENDS), default=STORAGE_BACKEND,
+                        help="record store backend")
+    parser.add_argument("--ocr-preset", choices=sorted(PRESETS), default="default",
+                        help="Tesseract page segmentation / engine mode preset")
+    parser.add_argument("--ocr-preprocess", action="store_true",
+                        help="grayscale, downscale, binarise and crop images before OCR")
+    parser.add_argument("--ocr-batch", type=int, default=1, help="images per Tesseract process")
+    parser.add_argument("--ocr-cache", default=OCR_CACHE_FILE, help="OCR result cache file")
+    parser.add_argument("--ocr-cache-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024))
+    parser.add_argument("--no-ocr-cache", action="store_true")
+    parser.add_argument("--incremental", action="store_true",
+                        help="skip known jobs and stop at the first page without new ones")
+    parser.add_argument("--seen-index", default=SEEN_INDEX_FILE)
+    parser.add_argument("--metrics-file", default=METRICS_FILE, help="Prometheus text file written at the end")
+    parser.add_argument("--summary-file", default=SUMMARY_FILE, help="JSON run summary written at the end")
+    parser.add_argument("--metrics-port", type=int, help="serve /metrics and /summary on this port")
+    parser.add_argument("--profile-stage", action="append", choices=STAGES, default=[],
+                        help="profile a stage; may be repeated")
+    parser.add_argument("--profiler", choices=("cprofile", "pyinstrument"), default="cprofile")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print_progress("Starting scraping process")
+    start_time = time.time()
+    for stage in args.profile_stage:
+        metrics.enable_profiling(stage, args.profiler)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    scheduler.configure(rate=args.rate, max_concurrency=args.max_concurrency)
+
+    store = open_store(args.storage, SQLITE_FILE if args.storage == "sqlite" else JSONL_FILE)
+    migrate_legacy_json(store, JSON_FILE)
+    configure(args.ocr_preset, args.ocr_preprocess)
+    ocr_cache = None
+    if not args.no_ocr_cache:
+        ocr_cache = OcrCache(args.ocr_cache, engine_fingerprint(), args.ocr_cache_mb * 1024 * 1024)
+    seen_index = None
+    if args.incremental:
+        seen_index = SeenIndex(args.seen_index)
+        seen_index.seed(store)
+    pipeline = CrawlPipeline(
+        store,
+        listing_url=f"{args.base_url}{LISTING_PATH}",
+        listing_concurrency=args.listing_concurrency,
+        detail_concurrency=args.detail_concurrency,
+        image_concurrency=args.image_concurrency,
+        ocr_workers=args.ocr_workers,
+        browser_workers=args.browser_workers,
+        queue_size=args.queue_size,
+        ocr_cache=ocr_cache,
+        seen_index=seen_index,
+        ocr_batch_size=args.ocr_batch,
+        requeues=args.requeues,
+    )
+
+    try:
+        asyncio.run(pipeline.run(range(1, args.pages + 1)))
+        print_progress("Scraping completed successfully")
+    except KeyboardInterrupt:
+        print_progress("Scraping interrupted by user")
+    finally:
+        store.close()
+        if EXPORT_JSON:
+            store.export_json(JSON_FILE)
+        if ocr_cache:
+            print_progress(f"OCR cache: {ocr_cache.stats()}")
+            ocr_cache.close()
+        if seen_index is not None:
+            print_progress(f"Skipped {seen_index.skipped} known jobs")
+            seen_index.close()
+        print_progress(f"Requests: {scheduler.stats()}")
+        metrics.write_prometheus(args.metrics_file)
+        metrics.write_summary(args.summary_file)
+        metrics.dump_profiles()
+        metrics.close()
+        duration = time.time() - start_time
+        print_progress(f"Saved {pipeline.saved} jobs in {duration:.2f} seconds "
+                       f"({pipeline.saved / duration:.2f} jobs/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""Shared scheduler for outbound requests.
+
+Every request to the site goes through one RequestScheduler per process,
+which keeps state per host:
+
+- a token bucket caps the request rate (``rate`` per second, bursts of
+  ``burst``);
+- an AIMD limit caps requests in flight: it grows by about one per round of
+  successful requests and halves on 429/5xx responses, timeouts, or a
+  sustained rise of recent latency well above the host's smoothed baseline;
+- failed requests (transport errors, 429 and 5xx) are retried with jittered
+  exponential backoff, honouring Retry-After;
+- a circuit breaker stops requests to a host for a while after repeated
+  failures, then lets a single trial request through before closing again.
+
+When a request still fails after its retries, TransientError is raised so
+the caller can put the job back in its queue instead of saving it as "N/A".
+While a circuit is open, CircuitOpenError is raised at once instead of
+waiting for the circuit to close.
+Plain httpx clients are used through ``request`` and async clients through
+``arequest``; ``slot`` applies the same limits to Selenium page loads.
+"""
+import asyncio
+import collections
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import httpx
+from selenium.common.exceptions import TimeoutException as WebDriverTimeout, WebDriverException
+
+from metrics import metrics
+
+DEFAULT_RATE = 20.0  # requests per second per host
+DEFAULT_BURST = 40
+DEFAULT_CONCURRENCY = 8  # starting in-flight limit per host
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 64
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_CAP = 30.0
+LATENCY_FACTOR = 3.0  # decrease when recent latency is this many times the baseline
+RECENT_WEIGHT = 0.2  # EWMA weight of each response in the recent latency; one outlier is not enough
+BASELINE_WEIGHT = 0.02  # EWMA weight in the baseline, which follows lasting changes slowly
+FAILURE_THRESHOLD = 5  # consecutive failures that open the circuit
+RESET_TIMEOUT = 30.0  # seconds the circuit stays open
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+class TransientError(Exception):
+    """A request failed in a way that is worth retrying later"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(TransientError):
+    """The host's circuit breaker is open, or half-open with its trial request in flight"""
+
+    def __init__(self, message, retry_after=None, half_open=False):
+        super().__init__(message, retry_after)
+        self.half_open = half_open
+
+
+def _is_host_failure(exc):
+    """Whether a browser error says the site is slow or unreachable, rather than the page odd"""
+    if isinstance(exc, (WebDriverTimeout, ConnectionError, TimeoutError)):
+        return True
+    # Chrome reports network failures of a navigation as e.g. "net::ERR_CONNECTION_REFUSED"
+    return isinstance(exc, WebDriverException) and "net::ERR_" in (exc.msg or "")
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+class HostState:
+    """Token bucket, AIMD concurrency limit and circuit breaker for one host"""
+
+    def __init__(self, host, rate, burst, concurrency, max_concurrency):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled = time.monotonic()
+        self.limit = float(min(concurrency, max_concurrency))
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.recent_latency = None
+        self.baseline_latency = None
+        self.last_decrease = 0.0
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self._condition = threading.Condition()
+        self._async_waiters = collections.deque()
+
+    def reserve_token(self):
+        """Take a token and return how long to wait before using it"""
+        with self._condition:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+            self.refilled = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def check_circuit(self):
+        """Raise CircuitOpenError unless a request may be sent now"""
+        with self._condition:
+            if self.state == OPEN:
+                remaining = self.opened_at + RESET_TIMEOUT - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(f"circuit open for {self.host}", retry_after=remaining)
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self.trial_in_flight:
+                    raise CircuitOpenError(f"circuit half-open for {self.host}", retry_after=1.0, half_open=True)
+                self.trial_in_flight = True
+
+    def reset_delay(self):
+        with self._condition:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.opened_at + RESET_TIMEOUT - time.monotonic())
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= max(MIN_CONCURRENCY, int(self.limit)):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self.in_flight < max(MIN_CONCURRENCY, int(self.limit)):
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def release(self, latency=None, congested=False, failed=False, throttled=False):
+        """Give a slot back and adjust the limit and circuit from the outcome"""
+        with self._condition:
+            self.requests += 1
+            self.throttled += throttled
+            now = time.monotonic()
+
+            if latency is not None and not congested:
+                if self.baseline_latency is None:
+                    self.recent_latency = self.baseline_latency = latency
+                self.recent_latency += RECENT_WEIGHT * (latency - self.recent_latency)
+                self.baseline_latency += BASELINE_WEIGHT * (latency - self.baseline_latency)
+                congested = self.recent_latency > LATENCY_FACTOR * max(self.baseline_latency, 0.05)
+            if congested:
+                # At most one multiplicative decrease per round trip
+                if now - self.last_decrease > (self.baseline_latency or 1.0):
+                    self.limit = max(MIN_CONCURRENCY, self.limit / 2)
+                    self.last_decrease = now
+            elif not failed:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+            if failed:
+                self.errors += 1
+                self.failures += 1
+                if self.state == HALF_OPEN or self.failures >= FAILURE_THRESHOLD:
+                    if self.state != OPEN:
+                        metrics.inc("circuit_opened_total")
+                    self.state = OPEN
+                    self.opened_at = now
+            else:
+                self.failures = 0
+                self.state = CLOSED
+        self.cancel()
+
+    def cancel(self):
+        """Give a slot back without recording an outcome"""
+        with self._condition:
+            self.in_flight -= 1
+            self.trial_in_flight = False
+            self._condition.notify_all()
+            waiters, self._async_waiters = self._async_waiters, collections.deque()
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "errors": self.errors,
+                "concurrency": round(self.limit, 1),
+                "circuit": self.state,
+            }
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class RequestScheduler:
+    """Rate, concurrency, retry and circuit-breaker policy shared by all requests of a process"""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, concurrency=DEFAULT_CONCURRENCY,
+                 max_concurrency=MAX_CONCURRENCY, max_attempts=MAX_ATTEMPTS):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.retries = 0
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def configure(self, rate=None, concurrency=None, max_concurrency=None, max_attempts=None):
+        """Change the policy for hosts not contacted yet"""
+        if rate is not None:
+            self.rate, self.burst = rate, max(1, int(rate * 2))
+        if concurrency is not None:
+            self.concurrency = concurrency
+        if max_concurrency is not None:
+            self.max_concurrency = max_concurrency
+        if max_attempts is not None:
+            self.max_attempts = max_attempts
+
+    def host(self, url):
+        host = urlsplit(str(url)).netloc
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = HostState(host, self.rate, self.burst,
+                                                      self.concurrency, self.max_concurrency)
+            return state
+
+    def backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, never shorter than the server asked for"""
+        delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def reset_delay(self):
+        """Seconds until no host's circuit is open any more"""
+        with self._lock:
+            hosts = list(self._hosts.values())
+        return max((state.reset_delay() for state in hosts), default=0.0)
+
+    def requeue_delay(self, error, requeues=0):
+        """How long an item whose retries ran out should wait before it is tried again"""
+        return self.backoff(self.max_attempts + requeues, error.retry_after)
+
+    def _outcome(self, state, response):
+        """Release a slot for a response and return a TransientError if it should be retried"""
+        if response.status_code in RETRY_STATUSES:
+            state.release(congested=True, failed=True, throttled=response.status_code in (429, 503))
+            return TransientError(f"HTTP {response.status_code} from {response.url}",
+                                  retry_after=_retry_after(response))
+        state.release(latency=response.elapsed.total_seconds())
+        return None
+
+    def request(self, client, method, url, **kwargs):
+        """Send a request with an httpx.Client under the scheduler's limits, retrying transient failures"""
+        state = self.host(url)
+        for attempt in range(self.max_attempts):
+            try:
+                state.check_circuit()
+                time.sleep(state.reserve_token())
+                state.acquire()
+                try:
+                    response = client.request(method, url, **kwargs)
+                except httpx.TransportError as e:
+                    state.release(congested=isinstance(e, httpx.TimeoutException), failed=True)
+                    raise TransientError(f"{type(e).__name__}: {e}") from e
+                except BaseException:
+                    state.cancel()
+                    raise
+                error = self._outcome(state, response)
+                if error is None:
+                    return response
+                raise error
+            except CircuitOpenError:
+                # Fail fast; the callers' requeue loops wait for retry_after
+                raise
+            except TransientError as e:
+                if attempt + 1 == self.max_attempts:
+                    raise
+                self.retries += 1
+                metrics.inc("http_retries_total")
+                time.sleep(self.backoff(attempt, e.retry_after))
+
+    async def arequest(self, client, method, url, **kwargs):
+        """Send a request with an httpx.AsyncClient under the scheduler's limits, retrying transient failures"""
+        state = self.host(url)
+        for attempt in range(self.max_attempts):
+            try:
+                state.check_circuit()
+                await asyncio.sleep(state.reserve_token())
+                await state.acquire_async()
+                try:
+                    response = await client.request(method, url, **kwargs)
+                except httpx.TransportError as e:
+                    state.release(congested=isinstance(e, httpx.TimeoutException), failed=True)
+                    raise TransientError(f"{type(e).__name__}: {e}") from e
+                except BaseException:
+                    state.cancel()
+                    raise
+                error = self._outcome(state, response)
+                if error is None:
+                    return response
+                raise error
+            except CircuitOpenError:
+                # Fail fast; the callers' requeue loops wait for retry_after
+                raise
+            except TransientError as e:
+                if attempt + 1 == self.max_attempts:
+                    raise
+                self.retries += 1
+                metrics.inc("http_retries_total")
+                await asyncio.sleep(self.backoff(attempt, e.retry_after))
+
+    @contextmanager
+    def slot(self, url):
+        """Hold a rate and concurrency slot for a browser page load to the URL's host
+
+        Only WebDriver timeouts and connection errors count against the host;
+        other errors, such as a missing element, free the slot without an outcome.
+        A page load spans rendering and waits for elements, so its duration is
+        kept out of the latency baseline of the host's HTTP requests.
+        """
+        state = self.host(url)
+        state.check_circuit()
+        time.sleep(state.reserve_token())
+        state.acquire()
+        try:
+            yield
+        except Exception as e:
+            if _is_host_failure(e):
+                state.release(congested=isinstance(e, (WebDriverTimeout, TimeoutError)), failed=True)
+            else:
+                state.cancel()
+            raise
+        except BaseException:
+            state.cancel()
+            raise
+        state.release()
+
+    def stats(self):
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {"retries": self.retries, "hosts": {host: state.stats() for host, state in hosts.items()}}
+
+
+# Shared scheduler used by the scrapers
+scheduler = RequestScheduler()
@@ -0,0 +1,593 @@
+"""Storage backends for scraped job records.
+
+The default backend is an append-only JSON Lines file: each job is one line,
+written through a buffered handle and fsynced in batches, so the cost of
+saving a job does not grow with the size of the file. The legacy
+single-array ``scraped_data.json`` can be produced from it on demand.
+
+Records written before all of their fields are known (for example while OCR
+is still running) are completed later by appending an update line keyed on
+the Job Reference Number; readers apply updates when iterating the store.
+
+The SQLite backend keeps one row per Job Reference Number (saving a job again
+replaces it), with the opening and closing dates parsed into sortable ISO
+dates, indexes on employer and closing date and an FTS5 index over the
+position and OCR text, so lookups and searches never load the whole data
+set into memory.
+
+Usage:
+    python3 storage.py export scraped_data.jsonl scraped_data.json
+    python3 storage.py export scraped_data.jsonl scraped_data.sqlite3
+    python3 storage.py query scraped_data.sqlite3 --employer "Example (Pvt) Ltd" --closing-within 7
+    python3 storage.py query scraped_data.sqlite3 --search "python developer" --format jsonl
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import sqlite3
+import textwrap
+import threading
+import time
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+DEFAULT_FSYNC_EVERY = 100  # records
+DEFAULT_FSYNC_INTERVAL = 5.0  # seconds
+UPDATE_KEY = "_update"
+_UPDATE_PREFIX = f'{{"{UPDATE_KEY}": '.encode()
+
+
+def read_jsonl(path):
+    """Yield records from a JSON Lines file, skipping lines that fail to parse"""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        return
+
+
+def read_records(path):
+    """Yield stored records with later update lines applied to still-incomplete records"""
+    # First pass: remember where the update lines are without parsing every record
+    updates = {}
+    try:
+        with open(path, "rb") as file:
+            offset = 0
+            for line in file:
+                if line.startswith(_UPDATE_PREFIX):
+                    try:
+                        update = json.loads(line)
+                    except json.JSONDecodeError:
+                        pass
+                    else:
+                        updates.setdefault(update[UPDATE_KEY], []).append(offset)
+                offset += len(line)
+    except FileNotFoundError:
+        return
+
+    if not updates:
+        yield from read_jsonl(path)
+        return
+
+    with open(path, "rb") as file:
+        for record in read_jsonl(path):
+            if UPDATE_KEY in record:
+                continue
+            offsets = updates.get(record.get("Job Reference Number"))
+            if offsets and None in record.values():
+                for offset in offsets:
+                    file.seek(offset)
+                    for name, value in json.loads(file.readline())["fields"].items():
+                        if record.get(name) is None:
+                            record[name] = value
+            yield record
+
+
+def write_jsonl(records, jsonl_path):
+    """Write records to a JSON Lines file, replacing it atomically"""
+    tmp_path = f"{jsonl_path}.tmp"
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, jsonl_path)
+    return count
+
+
+def write_json_array(records, json_path):
+    """Stream records into a single JSON array file, formatted like the legacy output"""
+    tmp_path = f"{json_path}.tmp"
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write("[")
+        for record in records:
+            file.write(",\n" if count else "\n")
+            file.write(textwrap.indent(json.dumps(record, indent=4, ensure_ascii=False), "    "))
+            count += 1
+        file.write("\n]" if count else "]")
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, json_path)
+    return count
+
+
+class JsonLinesStore:
+    """Append-only JSON Lines store with a buffered handle and batched fsync"""
+
+    def __init__(self, path, fsync_every=DEFAULT_FSYNC_EVERY,
+                 fsync_interval=DEFAULT_FSYNC_INTERVAL, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.recovered_bytes = self._recover()
+        self._file = open(path, "a", encoding="utf-8", buffering=buffer_size)
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _recover(self):
+        """Drop a truncated last line left behind by a crash mid-write"""
+        try:
+            with open(self.path, "rb+") as file:
+                size = file.seek(0, os.SEEK_END)
+                if size == 0:
+                    return 0
+                file.seek(size - 1)
+                if file.read(1) == b"\n":
+                    return 0
+
+                # Walk back to the last complete line
+                position = size
+                chunk_size = 4096
+                while position > 0:
+                    start = max(0, position - chunk_size)
+                    file.seek(start)
+                    chunk = file.read(position - start)
+                    index = chunk.rfind(b"\n")
+                    if index != -1:
+                        keep = start + index + 1
+                        break
+                    position = start
+                else:
+                    keep = 0
+
+                file.truncate(keep)
+                return size - keep
+        except FileNotFoundError:
+            return 0
+
+    def append(self, record):
+        """Append a single record; fsync once enough records or time have accumulated"""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._pending += 1
+            if (self._pending >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+
+    def update(self, job_ref, fields):
+        """Fill in fields that were left as None when a record was appended"""
+        line = json.dumps({UPDATE_KEY: job_ref, "fields": fields}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= self.fsync_every:
+                self._sync()
+
+    def sync(self):
+        """Flush buffered records and fsync them to disk"""
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def is_empty(self):
+        if self._file.closed:
+            return os.path.getsize(self.path) == 0
+        return self._file.tell() == 0
+
+    def __iter__(self):
+        if not self._file.closed:
+            self._file.flush()
+        return read_records(self.path)
+
+    def export_json(self, json_path):
+        """Write all stored records as a legacy single-array JSON file"""
+        return write_json_array(iter(self), json_path)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+DATE_FORMATS = ("%a %b %d %Y", "%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d %b %Y", "%b %d, %Y", "%B %d, %Y")
+
+# Record field -> column, in the order of the job_data built by the scrapers
+COLUMNS = {
+    "Job Reference Number": "job_ref",
+    "Position": "position",
+    "Employer": "employer",
+    "Opening Date": "opening_date",
+    "Closing Date": "closing_date",
+    "SEO Title": "seo_title",
+    "Meta Tags": "meta_tags",
+    "Extracted Text": "extracted_text",
+}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_ref TEXT PRIMARY KEY,
+    position TEXT,
+    employer TEXT,
+    opening_date TEXT,
+    closing_date TEXT,
+    opening_day TEXT,
+    closing_day TEXT,
+    seo_title TEXT,
+    meta_tags TEXT,
+    extracted_text TEXT,
+    extra TEXT,
+    saved_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_employer ON jobs (employer COLLATE NOCASE, closing_day);
+CREATE INDEX IF NOT EXISTS jobs_closing_day ON jobs (closing_day);
+CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+    position, extracted_text, content='jobs', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS jobs_fts_insert AFTER INSERT ON jobs BEGIN
+    INSERT INTO jobs_fts (rowid, position, extracted_text)
+    VALUES (new.rowid, new.position, new.extracted_text);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_fts_delete AFTER DELETE ON jobs BEGIN
+    INSERT INTO jobs_fts (jobs_fts, rowid, position, extracted_text)
+    VALUES ('delete', old.rowid, old.position, old.extracted_text);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_fts_update AFTER UPDATE OF position, extracted_text ON jobs BEGIN
+    INSERT INTO jobs_fts (jobs_fts, rowid, position, extracted_text)
+    VALUES ('delete', old.rowid, old.position, old.extracted_text);
+    INSERT INTO jobs_fts (rowid, position, extracted_text)
+    VALUES (new.rowid, new.position, new.extracted_text);
+END;
+"""
+
+
+_RECORD_COLUMNS = ("jobs.job_ref, jobs.position, jobs.employer, jobs.opening_date, jobs.closing_date, "
+                   "jobs.seo_title, jobs.meta_tags, jobs.extracted_text, jobs.extra")
+
+
+def parse_date(value):
+    """Parse a listing date such as "Mon Oct 13 2025" into an ISO date, or None"""
+    if not value:
+        return None
+    value = " ".join(value.split())
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+class SqliteStore:
+    """SQLite store keyed on Job Reference Number with date, employer and full-text indexes"""
+
+    def __init__(self, path, commit_every=DEFAULT_FSYNC_EVERY, commit_interval=DEFAULT_FSYNC_INTERVAL):
+        self.path = path
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SQLITE_SCHEMA)
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _row(record):
+        row = {column: record.get(field) for field, column in COLUMNS.items()}
+        if row["meta_tags"] is not None:
+            row["meta_tags"] = json.dumps(row["meta_tags"], ensure_ascii=False)
+        row["opening_day"] = parse_date(row["opening_date"])
+        row["closing_day"] = parse_date(row["closing_date"])
+        extra = {field: value for field, value in record.items() if field not in COLUMNS}
+        row["extra"] = json.dumps(extra, ensure_ascii=False) if extra else None
+        row["saved_at"] = time.time()
+        return row
+
+    @staticmethod
+    def _record(row):
+        (job_ref, position, employer, opening_date, closing_date,
+         seo_title, meta_tags, extracted_text, extra) = row
+        record = {
+            "Job Reference Number": job_ref,
+            "Position": position,
+            "Employer": employer,
+            "Opening Date": opening_date,
+            "Closing Date": closing_date,
+            "SEO Title": seo_title,
+            "Meta Tags": json.loads(meta_tags) if meta_tags is not None else None,
+            "Extracted Text": extracted_text,
+        }
+        if extra:
+            record.update(json.loads(extra))
+        return record
+
+    def append(self, record):
+        """Insert a record, replacing any earlier one with the same Job Reference Number"""
+        row = self._row(record)
+        columns = ", ".join(row)
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in row if column != "job_ref")
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO jobs ({columns}) VALUES ({', '.join('?' * len(row))}) "
+                f"ON CONFLICT (job_ref) DO UPDATE SET {assignments}",
+                tuple(row.values()),
+            )
+            self._pending += 1
+            if (self._pending >= self.commit_every
+                    or time.monotonic() - self._last_commit >= self.commit_interval):
+                self._commit()
+
+    def update(self, job_ref, fields):
+        """Fill in fields that were left as None when a record was appended"""
+        assignments, values = [], []
+        for field, value in fields.items():
+            column = COLUMNS.get(field)
+            if column is None or column == "job_ref":
+                continue
+            if column == "meta_tags" and value is not None:
+                value = json.dumps(value, ensure_ascii=False)
+            assignments.append(f"{column} = COALESCE({column}, ?)")
+            values.append(value)
+        if not assignments:
+            return
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE job_ref = ?", (*values, job_ref))
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._commit()
+
+    def sync(self):
+        """Commit pending records"""
+        with self._lock:
+            if self._db is not None:
+                self._commit()
+
+    def _commit(self):
+        self._db.commit()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def is_empty(self):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM jobs LIMIT 1").fetchone() is None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def get(self, job_ref):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {_RECORD_COLUMNS} FROM jobs WHERE job_ref = ?", (job_ref,)
+            ).fetchone()
+        return self._record(row) if row else None
+
+    def query(self, employer=None, closing_from=None, closing_to=None, search=None, limit=None):
+        """Yield records by employer, closing date range (ISO dates) and/or FTS5 match, without loading them all"""
+        conditions, values = [], []
+        source = "jobs"
+        order = "jobs.closing_day, jobs.job_ref"
+        if search:
+            source = "jobs_fts JOIN jobs ON jobs.rowid = jobs_fts.rowid"
+            conditions.append("jobs_fts MATCH ?")
+            values.append(search)
+            order = "jobs_fts.rank"
+        if employer:
+            conditions.append("jobs.employer = ? COLLATE NOCASE")
+            values.append(employer)
+        if closing_from:
+            conditions.append("jobs.closing_day >= ?")
+            values.append(closing_from)
+        if closing_to:
+            conditions.append("jobs.closing_day <= ?")
+            values.append(closing_to)
+        sql = f"SELECT {_RECORD_COLUMNS} FROM {source}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {order}"
+        if limit:
+            sql += " LIMIT ?"
+            values.append(limit)
+        yield from self._stream(sql, values)
+
+    def _stream(self, sql, values=()):
+        # A separate connection reads a consistent snapshot while this one keeps writing
+        self.sync()
+        reader = sqlite3.connect(self.path)
+        try:
+            for row in reader.execute(sql, values):
+                yield self._record(row)
+        finally:
+            reader.close()
+
+    def __iter__(self):
+        return self._stream(f"SELECT {_RECORD_COLUMNS} FROM jobs ORDER BY rowid")
+
+    def export_json(self, json_path):
+        """Write all stored records as a legacy single-array JSON file"""
+        return write_json_array(iter(self), json_path)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._commit()
+                self._db.close()
+                self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def migrate_legacy_json(store, json_path):
+    """Seed an empty store from a legacy single-array JSON file, once"""
+    if not store.is_empty() or not os.path.exists(json_path):
+        return 0
+    try:
+        with open(json_path, "r", encoding="utf-8") as file:
+            records = json.load(file)
+    except json.JSONDecodeError:
+        return 0
+    for record in records:
+        store.append(record)
+    store.sync()
+    return len(records)
+
+
+BACKENDS = {
+    "jsonl": JsonLinesStore,
+    "sqlite": SqliteStore,
+}
+SQLITE_EXTENSIONS = (".sqlite3", ".sqlite", ".db")
+
+
+def open_store(backend="jsonl", path=None, **options):
+    """Open a record store by backend name"""
+    try:
+        store_class = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {backend}") from None
+    return store_class(path, **options)
+
+
+def read_any(path):
+    """Yield the records of a JSON Lines, JSON array or SQLite file"""
+    if path.endswith(SQLITE_EXTENSIONS):
+        with SqliteStore(path) as store:
+            yield from store
+    elif path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as file:
+            yield from json.load(file)
+    else:
+        yield from read_records(path)
+
+
+def export(source, destination):
+    """Copy records between formats, chosen by file extension"""
+    records = read_any(source)
+    if destination.endswith(SQLITE_EXTENSIONS):
+        with SqliteStore(destination) as store:
+            count = 0
+            for record in records:
+                store.append(record)
+                count += 1
+        return count
+    if destination.endswith(".jsonl"):
+        return write_jsonl(records, destination)
+    return write_json_array(records, destination)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export and query stored job records")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="copy records between .jsonl, .json and .sqlite3 files")
+    export_parser.add_argument("source")
+    export_parser.add_argument("destination")
+
+    query_parser = commands.add_parser("query", help="query a SQLite store")
+    query_parser.add_argument("database")
+    query_parser.add_argument("--employer", help="exact employer name, case-insensitive")
+    query_parser.add_argument("--closing-from", help="earliest closing date, YYYY-MM-DD")
+    query_parser.add_argument("--closing-to", help="latest closing date, YYYY-MM-DD")
+    query_parser.add_argument("--closing-within", type=int, metavar="DAYS",
+                              help="closing between today and DAYS from now")
+    query_parser.add_argument("--search", help="FTS5 query over position and extracted text")
+    query_parser.add_argument("--limit", type=int)
+    query_parser.add_argument("--format", choices=("table", "json", "jsonl"),
+                              help="output format; table on stdout, jsonl with --output")
+    query_parser.add_argument("--output", help="write to this file (json or jsonl) instead of stdout")
+    return parser.parse_args()
+
+
+def run_query(args):
+    closing_from, closing_to = args.closing_from, args.closing_to
+    if args.closing_within is not None:
+        today = datetime.date.today()
+        closing_from = today.isoformat()
+        closing_to = (today + datetime.timedelta(days=args.closing_within)).isoformat()
+    if not os.path.exists(args.database):
+        raise SystemExit(f"No such database: {args.database}")
+    if args.output and args.format == "table":
+        raise SystemExit("--output writes json or jsonl, not a table")
+    args.format = args.format or ("jsonl" if args.output else "table")
+
+    with SqliteStore(args.database) as store:
+        records = store.query(args.employer, closing_from, closing_to, args.search, args.limit)
+        try:
+            # Run the query before any output is opened, so a bad --search fails cleanly
+            first = next(records, None)
+        except sqlite3.OperationalError as e:
+            if args.search:
+                raise SystemExit(f"Invalid --search query {args.search!r}: {e}; "
+                                 "put terms with punctuation in double quotes, e.g. '\"front-end\"'") from None
+            raise SystemExit(f"Query failed: {e}") from None
+        records = itertools.chain([first] if first is not None else [], records)
+        if args.output and args.format == "json":
+            count = write_json_array(records, args.output)
+        elif args.output:
+            count = write_jsonl(records, args.output)
+        else:
+            count = 0
+            for record in records:
+                if args.format == "table":
+                    print(f"{record['Job Reference Number']:<12} {record['Closing Date'] or '':<17} "
+                          f"{(record['Employer'] or '')[:30]:<30} {record['Position']}")
+                elif args.format == "json":
+                    # Stream the array so large results are never held in memory
+                    print("[" if not count else ",")
+                    print(textwrap.indent(json.dumps(record, indent=4, ensure_ascii=False), "    "), end="")
+                else:
+                    print(json.dumps(record, ensure_ascii=False))
+                count += 1
+            if args.format == "json":
+                print("\n]" if count else "[]")
+    if args.output:
+        print(f"Wrote {count} records to {args.output}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "export":
+        exported = export(args.source, args.destination)
+        print(f"Exported {exported} records to {args.destination}")
+    else:
+        run_query(args)
@@ -0,0 +1,143 @@
+"""HTML parsing for TopJobs listing and detail pages.
+
+Listing rows carry everything needed to open a vacancy: the ``onclick``
+handler on each ``tr[id^='tr']`` passes the reference, advertiser, job and
+employer codes to the site's ``createAlert`` script, which opens
+``/employer/JobAdvertismentServlet`` in a new tab. Rebuilding that URL lets
+the detail page be fetched with plain httpx instead of a browser click.
+"""
+import re
+from urllib.parse import urlencode, urljoin
+
+from bs4 import BeautifulSoup
+
+from scheduler import TransientError, scheduler
+
+DETAIL_PATH = "/employer/JobAdvertismentServlet"
+DETAIL_PARAMS = ("rid", "ac", "jc", "ec")
+LISTING_PAGE = "applicant/vacancybyfunctionalarea.jsp"
+
+_JS_ARGUMENT = re.compile(r"""['"]([^'"]*)['"]""")
+_AREA_CODE = re.compile(r"[?&]FA=([A-Za-z0-9]+)")
+_PAGE_NUMBER = re.compile(r"pageNo=(\d+)")
+
+
+def listing_url(base_url, area, page_num):
+    """URL of one page of a functional area's vacancy listing"""
+    return f"{base_url}/{LISTING_PAGE}?FA={area}&pageNo={page_num}"
+
+
+def find_job_rows(soup):
+    """Return the job rows of a listing page"""
+    return soup.find_all("tr", id=lambda x: x and x.startswith("tr"))
+
+
+def find_functional_areas(soup):
+    """Return {code: name} for every functional area linked from a page"""
+    areas = {}
+    for link in soup.find_all(["a", "option"]):
+        match = _AREA_CODE.search(link.get("href") or link.get("value") or "")
+        if match and match.group(1) not in areas:
+            areas[match.group(1)] = " ".join(link.get_text().split()) or match.group(1)
+    return areas
+
+
+def find_page_count(soup):
+    """Highest page number linked from a listing page, 1 if it is not paginated"""
+    numbers = [
+        int(number)
+        for tag in soup.find_all(["a", "option"])
+        for attribute in ("href", "onclick", "value")
+        for number in _PAGE_NUMBER.findall(tag.get(attribute) or "")
+    ]
+    return max(numbers, default=1)
+
+
+def parse_listing_row(job):
+    """Extract the listing fields of a job row"""
+    job_ref_element = job.find("td", width="5%", align="center")
+    job_ref = job_ref_element.text.strip() if job_ref_element else "N/A"
+
+    position_element = job.find("span", id="hdnJC1")
+    position = position_element.text.strip() if position_element else "N/A"
+
+    if position == "N/A":
+        job_desc_element = job.find("td", width="28%")
+        if job_desc_element:
+            for part in job_desc_element.stripped_strings:
+                if part != "DEFZZZ" and not part.startswith("000") and part.lower() != "company name withheld":
+                    position = part
+                    break
+
+    employer_element = job.find("h1")
+    employer = employer_element.text.strip() if employer_element else "N/A"
+
+    date_elements = job.find_all("td", nowrap=True)
+    opening_date = date_elements[1].text.strip() if len(date_elements) > 1 else "N/A"
+    closing_date = date_elements[2].text.strip() if len(date_elements) > 2 else "N/A"
+
+    return {
+        "Job Reference Number": job_ref,
+        "Position": position,
+        "Employer": employer,
+        "Opening Date": opening_date,
+        "Closing Date": closing_date,
+    }
+
+
+def detail_url_for_row(job, listing_url):
+    """Work out the detail page URL of a job row, or None if the markup has no usable link"""
+    link = job.find("a", href=lambda x: x and DETAIL_PATH.rsplit("/", 1)[-1] in x)
+    if link:
+        return urljoin(listing_url, link["href"])
+
+    onclick = job.get("onclick") or ""
+    arguments = _JS_ARGUMENT.findall(onclick)
+    if len(arguments) < len(DETAIL_PARAMS) or not arguments[0]:
+        return None
+
+    params = dict(zip(DETAIL_PARAMS, arguments))
+    params["pg"] = LISTING_PAGE
+    return f"{urljoin(listing_url, DETAIL_PATH)}?{urlencode(params)}"
+
+
+def parse_detail_page(html, page_url):
+    """Extract the title, named meta tags and ad image of a detail page, or None if it is not one"""
+    soup = BeautifulSoup(html, "html.parser")
+    remark = soup.find(id="remark")
+    if remark is None:
+        return None
+
+    seo_title = " ".join(soup.title.get_text().split()) if soup.title else ""
+
+    meta_tags = {}
+    for tag in soup.select("meta[name]"):
+        name = tag.get("name")
+        if name:
+            meta_tags[name] = tag.get("content")
+
+    image = remark.find("img", src=True)
+    image_src = urljoin(page_url, image["src"]) if image else None
+
+    return {
+        "SEO Title": seo_title,
+        "Meta Tags": meta_tags,
+        "Image Source": image_src,
+    }
+
+
+def fetch_job_details(client, detail_url):
+    """Fetch and parse a detail page over plain HTTP, returning None on any failure
+
+    TransientError is raised instead when the site is throttling or failing,
+    so the job can be retried later rather than handed to the browser.
+    """
+    try:
+        response = scheduler.request(client, "GET", detail_url)
+        if response.status_code != 200:
+            return None
+        return parse_detail_page(response.text, str(response.url))
+    except TransientError:
+        raise
+    except Exception:
+        return None
@@ -0,0 +1,182 @@
+"""Persistent (functional area, page) work queue shared by crawl workers.
+
+Every listing page of every functional area is one row in a SQLite table.
+Worker processes claim rows inside an immediate transaction, so no page is
+handed to two workers, and mark them done only after the page's jobs have
+been saved. The table is the crawl's checkpoint: after a crash or Ctrl-C the
+next run carries on with the pages that are not done yet. Claims expire after
+a lease, so pages held by a worker that died are picked up again.
+"""
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+
+WORK_QUEUE_FILE = "work_queue.sqlite3"
+LEASE_SECONDS = 900
+MAX_ATTEMPTS = 3
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS areas (
+    code TEXT PRIMARY KEY,
+    name TEXT,
+    pages INTEGER NOT NULL,
+    discovered_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS work_items (
+    area TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    claimed_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    new_jobs INTEGER,
+    error TEXT,
+    PRIMARY KEY (area, page)
+);
+CREATE INDEX IF NOT EXISTS work_items_status ON work_items (status, page);
+"""
+
+
+def worker_name(index=None):
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    return name if index is None else f"{name}:{index}"
+
+
+class WorkQueue:
+    """SQLite-backed queue of listing pages that several processes can claim from"""
+
+    def __init__(self, path=WORK_QUEUE_FILE, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Autocommit; claims take the write lock explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def add_area(self, code, name, pages):
+        """Record a functional area and enqueue any of its pages not queued yet"""
+        with self._transaction():
+            self._db.execute(
+                "INSERT OR REPLACE INTO areas (code, name, pages, discovered_at) VALUES (?, ?, ?, ?)",
+                (code, name, pages, time.time()),
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO work_items (area, page) VALUES (?, ?)",
+                [(code, page) for page in range(1, pages + 1)],
+            )
+
+    def areas(self):
+        return self._db.execute("SELECT code, name, pages FROM areas ORDER BY code").fetchall()
+
+    def claim(self, worker):
+        """Claim the next pending (or abandoned) page, returning (area, page) or None"""
+        now = time.time()
+        with self._transaction():
+            row = self._db.execute(
+                "SELECT area, page FROM work_items "
+                "WHERE status = ? OR (status = ? AND claimed_at < ?) "
+                "ORDER BY page, area LIMIT 1",
+                (PENDING, CLAIMED, now - self.lease_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE work_items SET status = ?, worker = ?, claimed_at = ?, attempts = attempts + 1 "
+                "WHERE area = ? AND page = ?",
+                (CLAIMED, worker, now, *row),
+            )
+        return row
+
+    def complete(self, area, page, new_jobs):
+        with self._transaction():
+            self._db.execute(
+                "UPDATE work_items SET status = ?, worker = NULL, new_jobs = ?, error = NULL "
+                "WHERE area = ? AND page = ?",
+                (DONE, new_jobs, area, page),
+            )
+
+    def fail(self, area, page, error):
+        """Put a page back in the queue, or give up on it after max_attempts claims"""
+        with self._transaction():
+            attempts = self._db.execute(
+                "SELECT attempts FROM work_items WHERE area = ? AND page = ?", (area, page)
+            ).fetchone()[0]
+            status = FAILED if attempts >= self.max_attempts else PENDING
+            self._db.execute(
+                "UPDATE work_items SET status = ?, worker = NULL, error = ? WHERE area = ? AND page = ?",
+                (status, str(error), area, page),
+            )
+
+    def release(self, area, page):
+        """Return a claimed page to the queue without counting it as an attempt"""
+        with self._transaction():
+            self._db.execute(
+                "UPDATE work_items SET status = ?, worker = NULL, attempts = attempts - 1 "
+                "WHERE area = ? AND page = ? AND status = ?",
+                (PENDING, area, page, CLAIMED),
+            )
+
+    def skip_after(self, area, page):
+        """Drop the pending pages of an area past the given one (incremental crawls)"""
+        with self._transaction():
+            self._db.execute(
+                "UPDATE work_items SET status = ? WHERE area = ? AND page > ? AND status = ?",
+                (SKIPPED, area, page, PENDING),
+            )
+
+    def release_claims(self):
+        """Requeue every claimed page; only safe while no workers are running"""
+        with self._transaction():
+            return self._db.execute(
+                "UPDATE work_items SET status = ?, worker = NULL WHERE status = ?", (PENDING, CLAIMED)
+            ).rowcount
+
+    def retry_failed(self):
+        with self._transaction():
+            return self._db.execute(
+                "UPDATE work_items SET status = ?, attempts = 0 WHERE status = ?", (PENDING, FAILED)
+            ).rowcount
+
+    def reset(self):
+        """Forget all areas and pages so the next run starts a fresh crawl"""
+        with self._transaction():
+            self._db.execute("DELETE FROM work_items")
+            self._db.execute("DELETE FROM areas")
+
+    def progress(self):
+        """Number of pages in each status"""
+        return dict(self._db.execute("SELECT status, COUNT(*) FROM work_items GROUP BY status"))
+
+    def remaining(self):
+        return self._db.execute(
+            "SELECT COUNT(*) FROM work_items WHERE status IN (?, ?)", (PENDING, CLAIMED)
+        ).fetchone()[0]
+
+    @contextmanager
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+